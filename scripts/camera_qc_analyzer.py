@@ -60,17 +60,15 @@ from tkinter import ttk, filedialog, messagebox
 SUPPORTED_EXT = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.webp'}
 
 # Expected subfolder names
-FOLDER_BLACKNOISE     = "BlackNoisePicUrl"
-FOLDER_IRCUT_ON_1ST   = "IrCutOnFirstPicUrl"
-FOLDER_IRCUT_ON_2ND   = "IrCutOnSecondPicUrl"
-FOLDER_IRCUT_OFF_1ST  = "IrCutOffFirstPicUrl"
-FOLDER_IRCUT_OFF_2ND  = "IrCutOffSecondPicUrl"
-
-ALL_SUBFOLDERS = [
+from camera_qc_folders import (
     FOLDER_BLACKNOISE,
     FOLDER_IRCUT_ON_1ST, FOLDER_IRCUT_ON_2ND,
     FOLDER_IRCUT_OFF_1ST, FOLDER_IRCUT_OFF_2ND,
-]
+    ALL_SUBFOLDERS,
+)
+
+DEFAULT_BN_THRESHOLD    = 45.0
+DEFAULT_IRCUT_THRESHOLD = -4.0
 
 # UI Colors
 BG           = "#111827"
@@ -148,10 +146,19 @@ def _imread(filepath):
     return cv2.imdecode(buf, cv2.IMREAD_COLOR)
 
 
+def decode_image(data):
+    """Decode encoded image bytes (e.g. a downloaded PNG) without touching disk."""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
 # ── Analysis Functions ──────────────────────────────────────────────────────
 def analyze_blacknoise(filepath):
     """Brightness analysis for black-noise images."""
-    img = _imread(filepath)
+    return analyze_blacknoise_image(_imread(filepath))
+
+
+def analyze_blacknoise_image(img):
+    """Brightness analysis on an already decoded BGR image."""
     if img is None:
         return None
     # Compute V = max(R,G,B) per pixel using numpy vectorized ops on raw array
@@ -176,7 +183,11 @@ def analyze_blacknoise(filepath):
 
 def analyze_ircut(filepath):
     """Color-cast analysis for IR cut images."""
-    img = _imread(filepath)
+    return analyze_ircut_image(_imread(filepath))
+
+
+def analyze_ircut_image(img):
+    """Color-cast analysis on an already decoded BGR image."""
     if img is None:
         return None
     # Use cv2.mean for fast channel means (C++ optimized, no python array alloc)
@@ -204,6 +215,18 @@ def analyze_ircut(filepath):
     }
 
 
+def judge_metrics(subfolder, metrics, bn_thresh, ir_thresh):
+    """Return (status, short value string) for one image's metrics."""
+    if "BlackNoise" in subfolder:
+        status = "PASS" if metrics['brightness'] < bn_thresh else "FAIL"
+        return status, f"V={metrics['brightness']:.1f}"
+    if "IrCutOn" in subfolder:
+        status = "PASS" if metrics['rg_diff'] >= ir_thresh else "FAIL"
+    else:
+        status = "PASS" if metrics['rg_diff'] < ir_thresh else "FAIL"
+    return status, f"R-G={metrics['rg_diff']:.1f}"
+
+
 # ── Excel Export ────────────────────────────────────────────────────────────
 def export_full_report(all_results, thresholds, output_path):
     """
@@ -564,8 +587,8 @@ class CameraQCApp:
             self.root.geometry("1200x820")
 
         self.root_folder = tk.StringVar(value="")
-        self.bn_threshold = tk.DoubleVar(value=45.0)
-        self.ircut_threshold = tk.DoubleVar(value=-4.0)
+        self.bn_threshold = tk.DoubleVar(value=DEFAULT_BN_THRESHOLD)
+        self.ircut_threshold = tk.DoubleVar(value=DEFAULT_IRCUT_THRESHOLD)
         self.all_results = {}     # folder_name -> [result dicts]
         self.detected_folders = {}  # folder_name -> image count
         self.running = False
@@ -962,7 +985,6 @@ class CameraQCApp:
                             os.path.splitext(f)[1].lower() in SUPPORTED_EXT])
 
             is_blacknoise = ("BlackNoise" in subfolder)
-            is_ircut_on = ("IrCutOn" in subfolder)
 
             self._log_safe(f"── Processing: {subfolder} ({len(files)} files) ──", "header")
 
@@ -990,15 +1012,7 @@ class CameraQCApp:
                         log_batch.append((f"  SKIP  {fname} — could not read image", "warn"))
                         continue
 
-                    if is_blacknoise:
-                        status = "PASS" if metrics['brightness'] < bn_thresh else "FAIL"
-                        val_str = f"V={metrics['brightness']:.1f}"
-                    elif is_ircut_on:
-                        status = "PASS" if metrics['rg_diff'] >= ir_thresh else "FAIL"
-                        val_str = f"R-G={metrics['rg_diff']:.1f}"
-                    else:
-                        status = "PASS" if metrics['rg_diff'] < ir_thresh else "FAIL"
-                        val_str = f"R-G={metrics['rg_diff']:.1f}"
+                    status, val_str = judge_metrics(subfolder, metrics, bn_thresh, ir_thresh)
 
                     metrics['status'] = status
                     metrics['sn'] = sn
@@ -1172,16 +1186,8 @@ class CameraQCApp:
         self._log(f"Re-classifying with BN={bn_thresh}, IR={ir_thresh}...", "info")
 
         for sf, results in self.all_results.items():
-            is_blacknoise = ("BlackNoise" in sf)
-            is_ircut_on = ("IrCutOn" in sf)
-
             for r in results:
-                if is_blacknoise:
-                    r['status'] = "PASS" if r['brightness'] < bn_thresh else "FAIL"
-                elif is_ircut_on:
-                    r['status'] = "PASS" if r['rg_diff'] >= ir_thresh else "FAIL"
-                else:
-                    r['status'] = "PASS" if r['rg_diff'] < ir_thresh else "FAIL"
+                r['status'], _ = judge_metrics(sf, r, bn_thresh, ir_thresh)
 
         self._build_tabs()
         self._show_stats_all()
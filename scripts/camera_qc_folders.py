@@ -0,0 +1,15 @@
+# Camera QC subfolder names, which are also the image URL columns of the
+# test export. Kept apart from camera_qc_analyzer so the image downloader
+# can recognize QC columns without loading OpenCV and tkinter.
+
+FOLDER_BLACKNOISE     = "BlackNoisePicUrl"
+FOLDER_IRCUT_ON_1ST   = "IrCutOnFirstPicUrl"
+FOLDER_IRCUT_ON_2ND   = "IrCutOnSecondPicUrl"
+FOLDER_IRCUT_OFF_1ST  = "IrCutOffFirstPicUrl"
+FOLDER_IRCUT_OFF_2ND  = "IrCutOffSecondPicUrl"
+
+ALL_SUBFOLDERS = [
+    FOLDER_BLACKNOISE,
+    FOLDER_IRCUT_ON_1ST, FOLDER_IRCUT_ON_2ND,
+    FOLDER_IRCUT_OFF_1ST, FOLDER_IRCUT_OFF_2ND,
+]
@@ -16,13 +16,20 @@ def ensure_package(pkg, imp=None):
 
 ensure_package("openpyxl")
 ensure_package("pandas")
-ensure_package("chardet")
+ensure_package("charset-normalizer", "charset_normalizer")
 
+import argparse
 import os
+import tempfile
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font
-import chardet
+from csv_encoding import detect_encoding
 
 # Helper for dynamic output folder
 
@@ -36,80 +43,316 @@ def get_output_folder(folder_name="extracted"):
     os.makedirs(output_folder, exist_ok=True)
     return output_folder
 
+def new_batch_dir(output_folder, prefix):
+    """Create and return a fresh '<prefix>_<timestamp>' folder; a counter is
+    appended when another run took the name within the same second."""
+    base = os.path.join(output_folder, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    path, n = base, 1
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            n += 1
+            path = f"{base}_{n}"
+
 # CSV to Excel
 
-def detect_encoding(file_path):
-    with open(file_path, 'rb') as f:
-        rawdata = f.read(10000)
-    result = chardet.detect(rawdata)
-    encoding = result['encoding']
-    return encoding if encoding else 'utf-8'
+# Fixed EELoad header layout; only the first len(HEADERS) CSV columns are kept
+HEADERS = [
+    "条码",
+    "产品型号",
+    "U(V)",
+    "Vp+ (Voltage peak value)",
+    "Vp-\n(Voltage valley value)",
+    "Vpp\n(Voltage peak valley difference)",
+    "I(A)",
+    "Ip+ (Peak current)",
+    "Ip- (Current valley value)",
+    "Ipp\n(Peak valley difference of current)",
+    "P(W)",
+    "Pp+ (Peak power)",
+    "Pp-\n(Power valley value)",
+    "Ppp\n(Rated maximum power)",
+    "测试时间",
+    "测试人员"
+]
 
-def csv_to_excel_with_headers(csv_file, output_dir):
-    encoding = detect_encoding(csv_file)
-
-    # read CSV
-    df = pd.read_csv(csv_file, dtype=str, encoding=encoding)
-    df.dropna(how='all', inplace=True)
-    df = df.apply(lambda col: col.str.strip() if col.dtype == 'object' else col)
-    df = df.loc[~(df.astype(str).apply(lambda row: row.str.strip().eq('').all(), axis=1))]
-
-    headers = [
-        "条码",
-        "产品型号",
-        "U(V)",
-        "Vp+ (Voltage peak value)",
-        "Vp-\n(Voltage valley value)",
-        "Vpp\n(Voltage peak valley difference)",
-        "I(A)",
-        "Ip+ (Peak current)",
-        "Ip- (Current valley value)",
-        "Ipp\n(Peak valley difference of current)",
-        "P(W)",
-        "Pp+ (Peak power)",
-        "Pp-\n(Power valley value)",
-        "Ppp\n(Rated maximum power)",
-        "测试时间",
-        "测试人员"
-    ]
-
-    n_cols = len(headers)
-    df = df.iloc[:, :n_cols]
-    df.columns = headers
-
-    wb = Workbook()
-    ws = wb.active
-
-    # write data
-    for r_idx, row in enumerate(df.itertuples(index=False), start=2):
-        for c_idx, value in enumerate(row, start=1):
-            ws.cell(row=r_idx, column=c_idx, value=value)
-
-    for col, header in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col, value=header)
+# CSV rows read and cleaned at a time
+CHUNK_ROWS = 50000
+
+def clean_chunk(df):
+    """Strip every cell and drop rows that are empty or whitespace only."""
+    df = df.dropna(how='all')
+    df = df.apply(lambda col: col.str.strip())
+    df = df.loc[~df.eq('').all(axis=1)]
+    if df.shape[1] < len(HEADERS):
+        raise ValueError(f"Expected at least {len(HEADERS)} columns, found {df.shape[1]}")
+    df = df.iloc[:, :len(HEADERS)]
+    # Missing cells become None so they are written as empty cells
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+def iter_csv_rows(csv_file, encoding=None):
+    """Yield cleaned data rows of csv_file, CHUNK_ROWS at a time."""
+    encoding = encoding or detect_encoding(csv_file)
+    with pd.read_csv(csv_file, dtype=str, encoding=encoding, chunksize=CHUNK_ROWS) as reader:
+        for chunk in reader:
+            yield from clean_chunk(chunk)
+
+def append_header_row(ws):
+    cells = []
+    for header in HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
         cell.alignment = Alignment(wrap_text=True, horizontal='center', vertical='center')
         cell.font = Font(name='Aptos Narrow')
+        cells.append(cell)
+    ws.append(cells)
+
+def write_workbook(csv_file, output_xlsx_file):
+    """Convert csv_file into output_xlsx_file and return the number of data rows."""
+    # Rows stream from the CSV straight into a write-only workbook, so only
+    # one chunk is ever held in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet")
+    append_header_row(ws)
+    rows = 0
+    try:
+        for row in iter_csv_rows(csv_file):
+            ws.append(row)
+            rows += 1
+    except Exception:
+        # Finish the sheet's temp file so an unreadable CSV leaves nothing open
+        ws.close()
+        raise
+    wb.save(output_xlsx_file)
+    return rows
 
+def csv_to_excel_with_headers(csv_file, output_dir):
     os.makedirs(output_dir, exist_ok=True)
     base_name = os.path.splitext(os.path.basename(csv_file))[0]
     output_xlsx_file = os.path.join(output_dir, base_name + ".xlsx")
 
     try:
-        wb.save(output_xlsx_file)
+        write_workbook(csv_file, output_xlsx_file)
         print(f"-----------")
         print(f"Conversion complete. Excel file can be found inside folder: '{output_dir}'\n")
     except PermissionError:
         print(f"\nPermission denied: Could not write to '{output_dir}'. Is the file open?\n")
 
+# ---- Batch mode ----
+# A folder or a .zip of CSVs is converted in a process pool. Without merging,
+# each worker writes its own workbook; when merging, workers only parse and
+# clean, and this process writes the single merged workbook in file order.
+
+MERGE_MODES = ("sheets", "single")
+
+# Rows per worksheet, header included (Excel's limit)
+EXCEL_MAX_ROWS = 1048576
+
+def is_batch_path(path):
+    return os.path.isdir(path) or path.lower().endswith(".zip")
+
+def list_csv_files(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(".csv") and os.path.isfile(os.path.join(folder, name)))
+
+def extract_csv_members(zip_path, dest_dir):
+    """Extract the CSVs of a zip (any depth) into dest_dir; returns their paths in name order."""
+    with zipfile.ZipFile(zip_path) as zf:
+        members = sorted(name for name in zf.namelist()
+                         if name.lower().endswith(".csv") and not name.startswith("__MACOSX/"))
+        return [zf.extract(name, dest_dir) for name in members]
+
+def batch_output_names(files, suffix=".xlsx"):
+    """One '<name>.xlsx' per input, numbered when two inputs share a name."""
+    names = []
+    seen = Counter()
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] += 1
+        names.append(f"{stem}{suffix}" if seen[stem] == 1 else f"{stem}_{seen[stem]}{suffix}")
+    return names
+
+def convert_batch_file(csv_file, output_xlsx_file):
+    """Convert one file of a batch (runs in a worker process)."""
+    summary = {"path": csv_file, "output": output_xlsx_file, "rows": 0, "error": None}
+    try:
+        summary["rows"] = write_workbook(csv_file, output_xlsx_file)
+    except Exception as e:
+        summary["error"] = str(e) or type(e).__name__
+    return summary
+
+def read_batch_file(csv_file):
+    """Cleaned rows of one file of a merged batch (runs in a worker process)."""
+    try:
+        return list(iter_csv_rows(csv_file)), None
+    except Exception as e:
+        return [], str(e) or type(e).__name__
+
+def iter_read_files(files, workers):
+    """(path, rows, error) per file in input order, parsed ahead by the pool.
+
+    At most two files per worker are in flight, so a long batch is never
+    held in memory while the merged workbook is being written.
+    """
+    if workers == 1:
+        for path in files:
+            yield (path,) + read_batch_file(path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        queue = iter(files)
+        for path in queue:
+            pending.append((path, executor.submit(read_batch_file, path)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(queue, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(read_batch_file, next_path)))
+            yield (path,) + future.result()
+
+def sheet_title(name, used):
+    """A valid, unique worksheet title derived from name."""
+    base = "".join(ch for ch in name if ch not in '[]:*?/\\').strip("'") or "Sheet"
+    title = base[:31]
+    n = 1
+    while title.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+class MergedWorkbook:
+    """Write-only workbook with the EELoad header on every sheet; a full sheet continues on a new one."""
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        self.ws = None
+        self.used_titles = set()
+        self.sheet_rows = 0
+
+    def new_sheet(self, name):
+        self.ws = self.wb.create_sheet(sheet_title(name, self.used_titles))
+        append_header_row(self.ws)
+        self.sheet_rows = 1
+
+    def append_rows(self, rows, name):
+        for row in rows:
+            if self.sheet_rows >= EXCEL_MAX_ROWS:
+                self.new_sheet(name)
+            self.ws.append(row)
+            self.sheet_rows += 1
+
+    def save(self, path):
+        if self.ws is None:
+            self.new_sheet("Sheet")
+        self.wb.save(path)
+
+def report_batch_file(path, rows, error):
+    name = os.path.basename(path)
+    if error:
+        print(f"❌ {name}: {error}")
+    else:
+        print(f"✅ {name}: {rows} rows")
+
+def run_batch(source, merge=None, workers=None):
+    """Convert every CSV in a folder or zip, optionally into one merged workbook; returns the exit code."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if os.path.isdir(source):
+            files = list_csv_files(source)
+        else:
+            try:
+                files = extract_csv_members(source, tmp_dir)
+            except zipfile.BadZipFile:
+                print(f"Not a valid zip file: {source}\n")
+                return 1
+        if not files:
+            print("No CSV files found.\n")
+            return 1
+
+        batch_dir = new_batch_dir(get_output_folder("extracted"), "eeload_batch")
+        workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+        print(f"🔄 Converting {len(files)} files with {workers} workers...")
+
+        errors = 0
+        if merge:
+            source_name = os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+            merged_path = os.path.join(batch_dir, f"{source_name}_merged.xlsx")
+            merged = MergedWorkbook()
+            if merge == "single":
+                merged.new_sheet("Sheet")
+            for path, rows, error in iter_read_files(files, workers):
+                report_batch_file(path, len(rows), error)
+                if error:
+                    errors += 1
+                    continue
+                name = os.path.splitext(os.path.basename(path))[0]
+                if merge == "sheets":
+                    merged.new_sheet(name)
+                merged.append_rows(rows, name if merge == "sheets" else "Sheet")
+            try:
+                merged.save(merged_path)
+            except PermissionError:
+                print(f"\nPermission denied: Could not write to '{merged_path}'. Is the file open?\n")
+                return 1
+        else:
+            outputs = [os.path.join(batch_dir, name) for name in batch_output_names(files)]
+            if workers == 1:
+                summaries = [convert_batch_file(path, out) for path, out in zip(files, outputs)]
+                for s in summaries:
+                    report_batch_file(s["path"], s["rows"], s["error"])
+            else:
+                summaries = []
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(convert_batch_file, path, out) for path, out in zip(files, outputs)]
+                    for future in as_completed(futures):
+                        s = future.result()
+                        report_batch_file(s["path"], s["rows"], s["error"])
+                        summaries.append(s)
+            errors = sum(1 for s in summaries if s["error"])
+
+    print("-----------")
+    print(f"{len(files) - errors} of {len(files)} files converted. Excel files can be found inside folder: '{batch_dir}'\n")
+    return 1 if errors else 0
+
 # ---- Main ----
 
-def main():
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Convert EELoad CSV files to Excel.")
+    parser.add_argument("path", help="A .csv file, or a folder / .zip of CSV files")
+    parser.add_argument("--merge", choices=MERGE_MODES, default=None,
+                        help="Merge a batch into one workbook: a sheet per file, or all rows on one sheet")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        args = parse_args(argv)
+        if is_batch_path(args.path):
+            return run_batch(args.path, args.merge, args.workers)
+        csv_to_excel_with_headers(args.path, get_output_folder("extracted"))
+        return 0
+
     try:
-        csv_file_path = input("Drop the path to a .csv file: ").strip('"').strip("'")
+        csv_file_path = input("Drop the path to a .csv file (or a folder / .zip for a batch): ").strip('"').strip("'")
         
         if not csv_file_path:
             print("No file path provided. Exiting.\n")
             sys.exit(1)
+
+        if is_batch_path(csv_file_path):
+            if not os.path.exists(csv_file_path):
+                print(f"File does not exist: {csv_file_path}\n")
+                sys.exit(1)
+            merge = input(f"Merge into one workbook? ({'/'.join(MERGE_MODES)}, Enter for one workbook per CSV): ").strip().lower()
+            if merge and merge not in MERGE_MODES:
+                print(f"Unknown merge mode '{merge}', writing one workbook per CSV.")
+                merge = None
+            return run_batch(csv_file_path, merge or None)
         
         if not os.path.isfile(csv_file_path):
             print(f"File does not exist: {csv_file_path}\n")
@@ -121,6 +364,7 @@ def main():
             
         output_path = get_output_folder("extracted")
         csv_to_excel_with_headers(csv_file_path, output_path)
+        return 0
         
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
@@ -128,7 +372,7 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         sys.exit(1)
     except Exception as e:
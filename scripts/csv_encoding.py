@@ -0,0 +1,111 @@
+import codecs
+import os
+
+# Shared text encoding detection for the CSV scripts.
+#
+# Most line exports are UTF-8 (with or without BOM), which is settled from a
+# byte-order mark or by validating a bounded sample; only files that fail
+# both go to a statistical detector. Verdicts are cached per file
+# fingerprint within one process, so a script that reads the same file
+# again (a prompt peeking at it before the run, a watch loop revalidating
+# it) pays for detection once. Worker processes of a batch each start empty.
+
+SAMPLE_BYTES = 64 * 1024
+# Statistical detection is far slower per byte, so it only sees this much
+GUESS_BYTES = 16 * 1024
+DEFAULT_ENCODING = "utf-8"
+
+# Line PCs export GBK; among equally likely guesses, prefer its superset
+PREFERRED_ENCODINGS = ("gb18030",)
+
+# UTF-32 LE starts with the UTF-16 LE mark, so it has to be checked first
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Entries kept; the oldest is dropped first, so a long watch session stays bounded
+CACHE_SIZE = 1024
+
+_cache = {}
+
+def file_fingerprint(path):
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+def read_samples(path, size):
+    """Head and tail of the file (the tail is empty for files under two samples)."""
+    with open(path, "rb") as f:
+        head = f.read(size)
+        if len(head) < size:
+            return head, b""
+        f.seek(0, os.SEEK_END)
+        if f.tell() <= 2 * size:
+            f.seek(size)
+            return head, f.read()
+        f.seek(-size, os.SEEK_END)
+        return head, f.read()
+
+def is_utf8(head, tail):
+    # A sample may cut a multi-byte character at either end: the head is
+    # decoded as unfinished, and the tail may start mid-character.
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=not tail)
+    except UnicodeDecodeError:
+        return False
+    if tail:
+        tail = tail.lstrip(bytes(range(0x80, 0xC0)))
+        try:
+            tail.decode("utf-8")
+        except UnicodeDecodeError:
+            return False
+    return True
+
+def whole_lines(head, tail):
+    """Samples cut back to complete lines, so no character is split in two."""
+    head = head[:head.rfind(b"\n") + 1] or head
+    if tail:
+        tail = tail[tail.find(b"\n") + 1:]
+    return head + tail
+
+def guess_encoding(sample):
+    """Statistical fallback: charset_normalizer if available, else chardet."""
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        try:
+            import chardet
+        except ImportError:
+            return None
+        return chardet.detect(sample).get("encoding")
+    matches = from_bytes(sample)
+    best = matches.best()
+    if best is None:
+        return None
+    for match in matches:
+        if (match.encoding in PREFERRED_ENCODINGS
+                and (match.chaos, match.coherence) == (best.chaos, best.coherence)):
+            return match.encoding
+    return best.encoding
+
+def detect_encoding(path, default=DEFAULT_ENCODING):
+    """Encoding to open path with; cached in-process until the file's size or mtime changes."""
+    key = file_fingerprint(path)
+    encoding = _cache.get(key)
+    if encoding:
+        return encoding
+
+    head, tail = read_samples(path, SAMPLE_BYTES)
+    encoding = next((name for bom, name in BOMS if head.startswith(bom)), None)
+    if encoding is None:
+        if is_utf8(head, tail):
+            encoding = "utf-8"
+        else:
+            encoding = guess_encoding(whole_lines(head[:GUESS_BYTES], tail[-GUESS_BYTES:])) or default
+    if len(_cache) >= CACHE_SIZE:
+        del _cache[next(iter(_cache))]
+    _cache[key] = encoding
+    return encoding
@@ -1,5 +1,13 @@
+import csv
+import gzip
+import hashlib
 import os
+import re
+import shutil
 import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from csv_encoding import detect_encoding
 
 # Helper for dynamic output
 
@@ -14,33 +22,210 @@ def get_output_folder(folder_name="extracted"):
     return output_folder
 
 # Split CSV by preserving format
+# The file is copied as raw bytes in large blocks: the 3 preamble lines and
+# the header are read once and repeated at the top of every part, and data
+# rows are never decoded. Only UTF-16/32 files, where a newline is not a
+# single byte, are read as text (still in blocks, line endings untouched).
 
-def split_csv_preserve_format(input_file, output_dir, rows_per_split):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+PREAMBLE_LINES = 3
 
-    # extract the first 3 lines + header
-    empty_lines = lines[:3]
-    header_line = lines[3]
-    data_lines = lines[4:]
+# Bytes (or characters) read and written per copy
+COPY_BLOCK = 1024 * 1024
+
+def open_source(input_file):
+    """Open input_file for splitting; returns (file, encoding for text mode or None)."""
+    encoding = detect_encoding(input_file)
+    if encoding.startswith(("utf-16", "utf-32")):
+        return open(input_file, 'r', encoding=encoding, newline=''), encoding
+    return open(input_file, 'rb'), None
+
+def nth_line_end(block, newline, start, n, line_len):
+    """Index just past the n-th newline at or after start (n >= 1, and the block has that many)."""
+    # Jump to where the n-th line should end at the block's average line
+    # length, count the newlines up to there, and walk only the difference
+    guess = min(len(block), start + int(n * line_len))
+    found = block.count(newline, start, guess)
+    if found < n:
+        pos = guess - 1
+        for _ in range(n - found):
+            pos = block.find(newline, pos + 1)
+    else:
+        pos = guess
+        for _ in range(found - n + 1):
+            pos = block.rfind(newline, start, pos)
+    return pos + 1
+
+def iter_line_blocks(src, empty, newline):
+    """(block, rows) pairs of whole lines; an unterminated last line comes alone as one row."""
+    carry = empty
+    for block in iter(lambda: src.read(COPY_BLOCK), empty):
+        if carry:
+            block = carry + block
+        cut = block.rfind(newline) + 1
+        carry = block[cut:]
+        if cut:
+            yield block[:cut], block.count(newline, 0, cut)
+    if carry:
+        yield carry, 1
+
+def char_bytes(encoding):
+    """Bytes per character of a text-mode part, for sizing UTF-16/32 parts."""
+    if not encoding:
+        return 1
+    return 4 if encoding.startswith("utf-32") else 2
+
+def iter_split_parts(input_file, output_dir, rows_per_split=None, max_bytes=None):
+    """Write the parts of input_file; yields (part path, data rows) as each part is closed.
+
+    A part is closed after rows_per_split rows, or before the row that would
+    take it over max_bytes (preamble and header included), whichever comes first.
+    """
+    if rows_per_split is None and max_bytes is None:
+        raise ValueError("Give a number of items per split or a maximum part size")
+    if rows_per_split is not None and rows_per_split < 1:
+        raise ValueError("Number of items per split must be at least 1")
+    src, encoding = open_source(input_file)
+    with src:
+        empty, newline = ('', '\n') if encoding else (b'', b'\n')
+        head = [src.readline() for _ in range(PREAMBLE_LINES + 1)]
+        if not head[-1]:
+            raise ValueError(f"Expected {PREAMBLE_LINES} preamble lines and a header in {input_file}")
+        header_block = empty.join(head)
+
+        part_budget = None
+        if max_bytes is not None:
+            # in text mode the budget is in characters; the -1 is the BOM
+            # (characters outside the BMP take 4 bytes in UTF-16 and are not accounted for)
+            part_budget = max_bytes // char_bytes(encoding) - len(header_block) - (1 if encoding else 0)
+            if part_budget < 1:
+                raise ValueError(f"The preamble and header alone take more than {max_bytes} bytes")
+
+        # create or ensure output folder path exists
+        os.makedirs(output_dir, exist_ok=True)
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        output_prefix = os.path.join(output_dir, base_name)
+
+        out = None
+        part_num = 0
+        for block, lines in iter_line_blocks(src, empty, newline):
+            line_len = len(block) / lines
+            pos = 0
+            while pos < len(block):
+                if out is None:
+                    part_num += 1
+                    part_path = f"{output_prefix}_part{part_num}.csv"
+                    if encoding:
+                        out = open(part_path, 'w', encoding=encoding, newline='')
+                    else:
+                        out = open(part_path, 'wb')
+                    out.write(header_block)
+                    part_rows = 0
+                    remaining = rows_per_split
+                    budget = part_budget
+
+                # by default the rest of the block goes into this part
+                end, take = len(block), lines
+                if remaining is not None and lines > remaining:
+                    end, take = nth_line_end(block, newline, pos, remaining, line_len), remaining
+                full = take == remaining
+                if budget is not None and end - pos > budget:
+                    # stop at the last whole row that still fits
+                    cut = block.rfind(newline, pos, pos + budget)
+                    if cut < 0 and not part_rows:
+                        raise ValueError(f"A row does not fit in {max_bytes} bytes together with the preamble and header")
+                    end = cut + 1 if cut >= 0 else pos
+                    take = block.count(newline, pos, end)
+                    full = True
+
+                out.write(block[pos:end])
+                part_rows += take
+                lines -= take
+                if remaining is not None:
+                    remaining -= take
+                if budget is not None:
+                    budget -= end - pos
+                pos = end
+                if full:
+                    out.close()
+                    out = None
+                    yield part_path, part_rows
+        if out is not None:
+            out.close()
+            yield part_path, part_rows
+
+# ---- Compression and manifest ----
+# Closed parts are handed to a process pool as the splitter goes, so
+# compressing and checksumming run while the rest of the file is read.
+
+COMPRESS_FORMATS = ("gz", "zip")
+COMPRESS_LEVEL = 6
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def finish_part(part_path, rows, compression=None):
+    """Compress a closed part if asked (runs in a worker process); returns its manifest entry."""
+    if compression == "gz":
+        final_path = part_path + ".gz"
+        with open(part_path, 'rb') as f_in, gzip.open(final_path, 'wb', compresslevel=COMPRESS_LEVEL) as f_out:
+            shutil.copyfileobj(f_in, f_out, COPY_BLOCK)
+    elif compression == "zip":
+        final_path = os.path.splitext(part_path)[0] + ".zip"
+        with zipfile.ZipFile(final_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
+            zf.write(part_path, os.path.basename(part_path))
+    else:
+        final_path = part_path
+    if final_path != part_path:
+        os.remove(part_path)
+    return {
+        "part": os.path.basename(final_path),
+        "rows": rows,
+        "bytes": os.path.getsize(final_path),
+        "sha256": file_sha256(final_path),
+    }
+
+def write_manifest(entries, manifest_path):
+    with open(manifest_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["part", "rows", "bytes", "sha256"])
+        writer.writeheader()
+        writer.writerows(entries)
+
+def split_csv_preserve_format(input_file, output_dir, rows_per_split=None, compression=None, workers=None, max_bytes=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = iter_split_parts(input_file, output_dir, rows_per_split, max_bytes)
+        futures = [executor.submit(finish_part, part_path, rows, compression) for part_path, rows in parts]
+        entries = [future.result() for future in futures]
+    if not entries:
+        print(f"No data rows to split in: {input_file}\n")
+        return entries
 
-    # create or ensure output folder path exists
-    os.makedirs(output_dir, exist_ok=True)
     base_name = os.path.splitext(os.path.basename(input_file))[0]
-    output_prefix = os.path.join(output_dir, base_name)
-
-    for i in range(0, len(data_lines), rows_per_split):
-        part = data_lines[i:i+rows_per_split]
-        part_num = i // rows_per_split + 1
-        with open(f"{output_prefix}_part{part_num}.csv", 'w', encoding='utf-8') as f_out:
-            f_out.writelines(empty_lines)
-            f_out.write(header_line)
-            f_out.writelines(part)
+    manifest_path = os.path.join(output_dir, f"{base_name}_manifest.csv")
+    write_manifest(entries, manifest_path)
     print(f"-----------")
-    print(f"CSV was split into {part_num} parts. Files located inside folder: '{output_dir}'\n")
+    print(f"CSV was split into {len(entries)} parts. Files located inside folder: '{output_dir}'")
+    print(f"Part names, row counts and checksums: '{os.path.basename(manifest_path)}'\n")
+    return entries
 
 # ---- Main ----
 
+# Decimal units, so a part never exceeds an upload limit given in either MB or MiB
+SIZE_UNITS = {"b": 1, "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3}
+
+def parse_split_answer(answer):
+    """'5000' -> (5000, None) items per split; '20MB' -> (None, 20000000) bytes per part."""
+    answer = answer.strip().lower()
+    if answer.isdigit():
+        return int(answer), None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*(b|kb|mb|gb)", answer)
+    if not match:
+        raise ValueError(f"Not a number of items or a size: '{answer}'")
+    return None, int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
 def main():
     csv_file = input("Drop the path to a .csv file: ").strip().strip('"').strip("'")
     if not csv_file:
@@ -58,10 +243,15 @@ def main():
         print(f"The file is not a CSV: {csv_file}\n")
         sys.exit(1)
         
-    # prompt user for number of items        
-    split_number = int(input("Please enter number of items per split: "))
+    # prompt user for number of items, or a size limit per part
+    split_number, max_bytes = parse_split_answer(
+        input("Please enter number of items per split (or a maximum part size, e.g. 20MB): "))
+    compression = input(f"Compress parts? ({'/'.join(COMPRESS_FORMATS)}, Enter for plain .csv): ").strip().lower().lstrip('.')
+    if compression and compression not in COMPRESS_FORMATS:
+        print(f"Unknown format '{compression}', writing plain .csv parts.")
+        compression = None
     output_folder = get_output_folder("extracted")
-    split_csv_preserve_format(csv_file, output_folder, split_number)
+    split_csv_preserve_format(csv_file, output_folder, split_number, compression or None, max_bytes=max_bytes)
 
 if __name__ == "__main__":
     try:
@@ -14,24 +14,51 @@ def ensure_package(pkg, imp=None):
             print(f"❌ Failed to install {pkg}: {e}")
             sys.exit(1)
 
-ensure_package("pandas")
 ensure_package("requests")
 ensure_package("tqdm")
 ensure_package("openpyxl")
 
 import os
+import csv
+import random
+import shutil
 import signal
-import pandas as pd
+import sqlite3
+import hashlib
+import time
+import openpyxl
 import requests
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, urlunsplit
+from email.utils import parsedate_to_datetime
 from tqdm import tqdm
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import islice
+from camera_qc_folders import ALL_SUBFOLDERS
 
 # Config
 
 possible_id_col = ["FactoryId", "SerialNumber"]
-max_workers = 32
+url_sample_rows = 10    # data rows read up front to detect URL columns
+max_workers = 32        # download threads in total
+per_host_limit = 16     # max concurrent requests to a single host
+min_per_host = 2        # adaptive limit never drops below this
+latency_target = 1.0    # seconds; slower responses shrink the per-host limit
+max_pending = max_workers * 4   # submitted-but-unfinished downloads at any time
+manifest_name = "manifest.sqlite"
+retry_file_name = "failed_urls.csv"
+backoff_base = 0.5      # seconds; retry n waits up to backoff_base * 2**(n-1)
+backoff_cap = 30.0      # longest wait between retries, also caps Retry-After
+breaker_window = 20     # recent requests per host considered by the breaker
+breaker_min_requests = 10
+breaker_error_rate = 0.5
+breaker_cooldown = 30.0 # seconds a tripped host is left alone
+request_timeout = 10
+chunk_size = 64 * 1024
+# Byte-exact transfers so Content-Length and Range offsets match the file on disk
+identity_headers = {"Accept-Encoding": "identity"}
 
 # Helper for dynamic output folder
 
@@ -58,97 +85,313 @@ def clean_url(val):
     return None
 
 def normalize_url(url):
-    return url.strip().lower()
+    # Scheme and host are case-insensitive, the path and query are not
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_file(src, dst):
+    """Hard-link an already downloaded image to a second name, copying where links are unsupported."""
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
 
 # Thread-safe filename tracking (ADDED)
 
 used_filenames = defaultdict(set)
 filename_lock = threading.Lock()
 
-# Get input Excel file
-try:
-    excel_path = input("Drop the path to an Excel (.xlsx) file: ").strip().strip('"').strip("'")
+# Download manifest
 
-    if not excel_path:
-        print("No file path provided. Exiting.\n")
-        sys.exit(1)
+class DownloadManifest:
+    """SQLite record of every URL fetched into output_dir.
 
-    if not os.path.isfile(excel_path):
-        print(f"File not found: {excel_path}\n")
-        sys.exit(1)
+    Keyed by normalized URL, each entry holds the saved path (relative to
+    output_dir), SHA-256, size and the status of the last attempt, so a rerun
+    can tell which URLs are new and which are already on disk.
+    """
 
-    if not excel_path.lower().endswith(".xlsx"):
-        print(f"Invalid file type. Please provide a .xlsx file.\n")
+    def __init__(self, path, commit_every=500):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            "url TEXT PRIMARY KEY, path TEXT, sha256 TEXT, size INTEGER, status TEXT, updated TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_sha256 ON downloads (sha256)")
+        self.commit_every = commit_every
+        self._uncommitted = 0
+
+    def lookup(self, url):
+        """Absolute path of a verified earlier download of url, or None."""
+        row = self.conn.execute(
+            "SELECT path, size, status FROM downloads WHERE url = ?", (url,)
+        ).fetchone()
+        if not row or row[2] != "Downloaded":
+            return None
+        path = os.path.join(output_dir, row[0])
+        if not os.path.isfile(path) or os.path.getsize(path) != row[1]:
+            return None
+        return path
+
+    def record(self, url, path, status, checksum=None):
+        size = os.path.getsize(path) if checksum else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?)",
+            (url, os.path.relpath(path, output_dir), checksum, size, status,
+             time.strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+# Per-host adaptive concurrency
+
+class HostLimiter:
+    """Caps concurrent requests per host and adapts the cap to response latency.
+
+    Every host starts at ``maximum`` slots. A response slower than ``target``
+    seconds (smoothed) or a failed request halves the host's limit, down to
+    ``minimum``, at most once per ``target`` seconds; each fast, successful
+    response gives one slot back.
+    """
+
+    def __init__(self, minimum=min_per_host, maximum=per_host_limit, target=latency_target):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target
+        self._cond = threading.Condition()
+        self._active = defaultdict(int)
+        self._limit = {}
+        self._latency = {}
+        self._last_cut = {}
+
+    def acquire(self, host):
+        with self._cond:
+            self._limit.setdefault(host, self.maximum)
+            while self._active[host] >= self._limit[host]:
+                self._cond.wait()
+            self._active[host] += 1
+
+    def release(self, host, latency=None, ok=True):
+        with self._cond:
+            self._active[host] -= 1
+            if latency is not None:
+                prev = self._latency.get(host, latency)
+                self._latency[host] = 0.8 * prev + 0.2 * latency
+            limit = self._limit[host]
+            now = time.monotonic()
+            if not ok or self._latency.get(host, 0.0) > self.target:
+                if now - self._last_cut.get(host, 0.0) >= self.target:
+                    limit = max(self.minimum, limit // 2)
+                    self._last_cut[host] = now
+            else:
+                limit = min(self.maximum, limit + 1)
+            self._limit[host] = limit
+            self._cond.notify_all()
+
+# Per-host circuit breaker
+
+class CircuitBreaker:
+    """Stops sending requests to a host whose recent error rate spikes.
+
+    Once at least ``min_requests`` of the last ``window`` requests to a host
+    are known and ``error_rate`` of them failed, the host is left alone for
+    ``cooldown`` seconds; afterwards its history is cleared and traffic resumes.
+    """
+
+    def __init__(self, window=breaker_window, min_requests=breaker_min_requests,
+                 error_rate=breaker_error_rate, cooldown=breaker_cooldown):
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._outcomes = defaultdict(lambda: deque(maxlen=window))
+        self._open_until = {}
+
+    def record(self, host, ok):
+        with self._lock:
+            outcomes = self._outcomes[host]
+            outcomes.append(ok)
+            failures = outcomes.count(False)
+            if len(outcomes) >= self.min_requests and failures / len(outcomes) >= self.error_rate:
+                self._open_until[host] = time.monotonic() + self.cooldown
+                outcomes.clear()
+
+    def remaining(self, host):
+        """Seconds until host may be contacted again (0 when closed)."""
+        with self._lock:
+            return max(0.0, self._open_until.get(host, 0.0) - time.monotonic())
+
+    def wait(self, host):
+        delay = self.remaining(host)
+        while delay > 0:
+            time.sleep(delay)
+            delay = self.remaining(host)
+
+def url_host(url):
+    return urlsplit(url).netloc.lower()
+
+def retry_after_seconds(response):
+    value = (response.headers.get("Retry-After") or "").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Client errors worth another attempt: timeouts and rate limits, and 416,
+# after which fetch_to_file has dropped the stale .part and starts over
+retryable_client_errors = (408, 416, 429)
+
+def is_final_error(error):
+    """True for other 4xx answers (missing or forbidden images): the host is
+    fine and asking again won't change the answer."""
+    response = getattr(error, "response", None)
+    return (response is not None and 400 <= response.status_code < 500
+            and response.status_code not in retryable_client_errors)
+
+def retry_delay(attempt, error):
+    """Full-jitter exponential backoff, or the server's Retry-After if it sent one."""
+    response = getattr(error, "response", None)
+    if response is not None and response.status_code in (429, 503):
+        delay = retry_after_seconds(response)
+        if delay is not None:
+            return min(delay, backoff_cap)
+    return random.uniform(0, min(backoff_cap, backoff_base * 2 ** (attempt - 1)))
+
+def create_session(pool_size=per_host_limit):
+    """Session whose connection pool matches the per-host concurrency, so
+    worker threads reuse keep-alive connections instead of queueing on the
+    default 10-connection pool."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=pool_size, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Input handling
+
+def prompt_excel_path():
+    try:
+        excel_path = input(f"Drop the path to an Excel (.xlsx) file or a {retry_file_name} retry file: ").strip().strip('"').strip("'")
+
+        if not excel_path:
+            print("No file path provided. Exiting.\n")
+            sys.exit(1)
+
+        if not os.path.isfile(excel_path):
+            print(f"File not found: {excel_path}\n")
+            sys.exit(1)
+
+        if not excel_path.lower().endswith((".xlsx", ".csv")):
+            print(f"Invalid file type. Please provide a .xlsx or {retry_file_name} file.\n")
+            sys.exit(1)
+    except KeyboardInterrupt:
         sys.exit(1)
-except KeyboardInterrupt:
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        sys.exit(1)
+    return excel_path
+
+class ExcelRowStream:
+    """First sheet of a workbook, read row by row in openpyxl read-only mode.
+
+    Only the header and the first ``sample_size`` data rows are read up front
+    (for column detection); iterating yields those rows and then streams the
+    rest, so downloads start before the whole sheet has been parsed.
+    """
+
+    def __init__(self, path, sample_size=url_sample_rows):
+        self.workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        sheet = self.workbook.active
+        self._rows = sheet.iter_rows(values_only=True)
+        header = next(self._rows, ())
+        self.columns = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        self.sample = list(islice(self._rows, sample_size))
+        # Row count from the sheet's dimension record, when the writer stored one
+        self.estimated_rows = max((sheet.max_row or 0) - 1, 0) or None
+
+    def __iter__(self):
+        yield from self.sample
+        yield from self._rows
+
+    def close(self):
+        self.workbook.close()
+
+def load_excel(excel_path):
+    print(f"Using Excel file: {excel_path}")
+    try:
+        return ExcelRowStream(excel_path)
+    except Exception as e:
+        print(f"Failed to read Excel file: {e}\n")
         sys.exit(1)
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
-    sys.exit(1)
-
-# Load Excel
 
-print(f"Using Excel file: {excel_path}")
-try:
-    df = pd.read_excel(excel_path)
-except Exception as e:
-    print(f"Failed to read Excel file: {e}\n")
-    sys.exit(1)
+def cell_text(row, index):
+    value = row[index] if index < len(row) else None
+    return str(value).strip() if value is not None else ""
 
 # Detect which ID column to use
-    
-id_col = None
-for col in possible_id_col:
-    if col in df.columns:
-        id_col = col
-        break
-    
-if not id_col:
-    print(f"None of the expected ID columns found: {possible_id_col}")
-    print(f"Available columns: {list(df.columns)}")
-    id_col = input("Please enter the column name to use as ID: ").strip()
-    if id_col not in df.columns:
-        print(f"Column '{id_col}' not found in file.")
-        sys.exit(1)
 
-print(f"Using ID column: '{id_col}'")
+def detect_id_column(columns):
+    id_col = None
+    for col in possible_id_col:
+        if col in columns:
+            id_col = col
+            break
+
+    if not id_col:
+        print(f"None of the expected ID columns found: {possible_id_col}")
+        print(f"Available columns: {columns}")
+        id_col = input("Please enter the column name to use as ID: ").strip()
+        if id_col not in columns:
+            print(f"Column '{id_col}' not found in file.")
+            sys.exit(1)
+
+    print(f"Using ID column: '{id_col}'")
+    return id_col
 
-# Detect URL columns
+# Detect URL columns from the header name or the sampled rows
 
-def detect_url_columns(df, sample_size=10):
+def detect_url_columns(columns, sample_rows):
     url_cols = []
-    for col in df.columns:
-        if df[col].dropna().astype(str).head(sample_size).str.startswith("http").any():
+    for i, col in enumerate(columns):
+        if col.strip().lower().endswith("url") or any(
+            cell_text(row, i).startswith("http") for row in sample_rows
+        ):
             url_cols.append(col)
     return url_cols
 
-url_columns = detect_url_columns(df)
-if not url_columns:
-    print("No columns contain URLs.")
-    sys.exit(1)
-
-print(f"URL columns detected: {url_columns}")
-
-# Create folders
-
-for col in url_columns:
-    folder_path = os.path.join(output_dir, col.strip())
-    os.makedirs(folder_path, exist_ok=True)
-
-# Download function with retry logic
-
-def download_image(session, record_id, folder_name, url, max_retries=3):
-    if not url:
-        return "Skipped invalid URL"
+# Filename-based duplicate handling
+# Names are reserved in submission order, so a rerun maps every row to the
+# same file and can resume or skip it.
 
+def reserve_file_path(record_id, folder_name, url):
     folder_path = os.path.join(output_dir, folder_name.strip())
 
     file_ext = os.path.splitext(url)[1]
     if not file_ext or len(file_ext) > 5:
         file_ext = '.png'
 
-    # Filename-based duplicate handling
-
     base_name = str(record_id)
 
     with filename_lock:
@@ -164,25 +407,258 @@ def download_image(session, record_id, folder_name, url, max_retries=3):
                     break
                 index += 1
 
-    file_path = os.path.join(folder_path, final_name)
+    return os.path.join(folder_path, final_name)
+
+# Streaming download with resume
+
+def expected_size(response):
+    if response.status_code == 206:
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("Content-Length", "")
+    return int(length) if length.isdigit() else None
+
+def already_downloaded(session, url, file_path):
+    if not os.path.isfile(file_path):
+        return False
+    response = session.head(url, headers=identity_headers, timeout=request_timeout, allow_redirects=True)
+    if not response.ok:
+        return False
+    return expected_size(response) == os.path.getsize(file_path)
+
+def fetch_to_file(session, url, file_path):
+    """Stream url into file_path via a .part file, resuming a previous partial download."""
+    if already_downloaded(session, url, file_path):
+        return "Already present"
+
+    part_path = file_path + ".part"
+    offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+    headers = dict(identity_headers)
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    with session.get(url, headers=headers, stream=True, timeout=request_timeout) as response:
+        if response.status_code == 416:
+            # Partial file no longer matches the remote one; start over next attempt
+            os.remove(part_path)
+        response.raise_for_status()
+        if response.status_code != 206:
+            offset = 0
+        total = expected_size(response)
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+
+    if total is not None and os.path.getsize(part_path) != total:
+        raise IOError(f"Incomplete download: {os.path.getsize(part_path)} of {total} bytes")
+    os.replace(part_path, file_path)
+    return "Downloaded"
+
+# Download function with retry logic
+
+def run_with_retries(limiter, breaker, url, action, max_retries=3):
+    """Run action() inside the host's concurrency slot, backing off between
+    failed attempts. Returns its result or raises the last error.
+
+    A final 4xx answer is raised at once and, as the host did answer, counts
+    as healthy for the limiter and the breaker."""
+    host = url_host(url)
 
     for attempt in range(1, max_retries + 1):
+        breaker.wait(host)
+        limiter.acquire(host)
+        started = time.monotonic()
+        ok = False
         try:
-            response = session.get(url, timeout=10)
-            response.raise_for_status()
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            return "Downloaded"
-        except Exception:
-            if attempt == max_retries:
-                return "Failed"
+            result = action()
+            ok = True
+            return result
+        except Exception as e:
+            ok = is_final_error(e)
+            if ok or attempt == max_retries:
+                raise
+            delay = retry_delay(attempt, e)
+        finally:
+            limiter.release(host, time.monotonic() - started, ok)
+            breaker.record(host, ok)
+        # Back off outside the host slot so other downloads can use it
+        time.sleep(delay)
+
+def download_image(session, limiter, breaker, url, file_path, max_retries=3):
+    """Returns (status, detail): the sha256 of the saved file on success,
+    otherwise the last error message."""
+    if not url:
+        return "Skipped invalid URL", None
+
+    try:
+        result = run_with_retries(limiter, breaker, url,
+                                  lambda: fetch_to_file(session, url, file_path), max_retries)
+    except Exception as e:
+        return "Failed", str(e)
+    return result, file_checksum(file_path)
+
+# Camera QC pipeline: score images in memory instead of saving them
+
+def fetch_bytes(session, url):
+    response = session.get(url, timeout=request_timeout)
+    response.raise_for_status()
+    return response.content
+
+def analyze_image_url(session, limiter, breaker, url, file_path, column, thresholds, keep_failed):
+    """Download url into memory and score it like camera_qc_analyzer would.
+
+    Returns ("Analyzed", metrics) or ("Failed", error). Only FAIL images are
+    written to file_path, and only when keep_failed is set.
+    """
+    import camera_qc_analyzer as qc
+
+    try:
+        data = run_with_retries(limiter, breaker, url, lambda: fetch_bytes(session, url))
+    except Exception as e:
+        return "Failed", str(e)
+
+    img = qc.decode_image(data)
+    if "BlackNoise" in column:
+        metrics = qc.analyze_blacknoise_image(img)
+    else:
+        metrics = qc.analyze_ircut_image(img)
+    if metrics is None:
+        return "Failed", "could not decode image"
+
+    metrics['status'], _ = qc.judge_metrics(column, metrics, thresholds['blacknoise'], thresholds['ircut'])
+    metrics['filename'] = os.path.basename(file_path)
+    metrics['subfolder'] = column
+    if metrics['status'] == "FAIL" and keep_failed:
+        part_path = file_path + ".part"
+        with open(part_path, 'wb') as f:
+            f.write(data)
+        os.replace(part_path, file_path)
+    return "Analyzed", metrics
+
+def prompt_float(prompt, default):
+    value = input(f"{prompt} [{default}]: ").strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Invalid number, using {default}")
+        return default
+
+def prompt_qc_pipeline(url_columns):
+    """Ask whether camera QC columns should be analyzed in memory.
+
+    Returns (settings or None, qc_columns). The analyzer, with its OpenCV
+    and tkinter imports, is only loaded when a QC column is present."""
+    qc_columns = [col for col in url_columns if col.strip() in ALL_SUBFOLDERS]
+    if not qc_columns:
+        return None, []
+    import camera_qc_analyzer as qc
+
+    answer = input(f"Analyze {qc_columns} in memory with Camera QC instead of saving them? (y/N): ").strip().lower()
+    if answer != "y":
+        return None, []
+    settings = {
+        'blacknoise': prompt_float("BlackNoise threshold", qc.DEFAULT_BN_THRESHOLD),
+        'ircut': prompt_float("IR Cut threshold (R-G diff)", qc.DEFAULT_IRCUT_THRESHOLD),
+        'keep_failed': input("Save FAIL images to disk? (Y/n): ").strip().lower() != "n",
+    }
+    return settings, qc_columns
+
+def export_qc_results(qc_results, settings):
+    import camera_qc_analyzer as qc
+
+    for results in qc_results.values():
+        results.sort(key=lambda r: r['filename'])
+        for sn, item in enumerate(results, 1):
+            item['sn'] = sn
+    report_path = os.path.join(output_dir, f"camera_qc_report_{time.strftime('%Y%m%d_%H%M%S')}.xlsx")
+    qc.export_full_report(qc_results, settings, report_path)
+    for column, results in qc_results.items():
+        passed = sum(1 for r in results if r['status'] == "PASS")
+        print(f"{column}: {passed} PASS / {len(results) - passed} FAIL")
+    print(f"Camera QC report saved to: '{report_path}'")
+
+# Rows -> (record_id, column, url) jobs
+
+def iter_download_jobs(rows, columns, id_col, url_columns):
+    id_index = columns.index(id_col)
+    url_indexes = [(col, columns.index(col)) for col in url_columns]
+    for row in rows:
+        record_id = cell_text(row, id_index)
+        if not record_id:
+            continue
+        for col, index in url_indexes:
+            url = clean_url(row[index] if index < len(row) else None)
+            if url:
+                yield record_id, col, url
+
+# Failed-URL retry file
+# Name is the stem of the target file, so a retry writes to the same path.
+
+retry_fields = ["Name", "Column", "Url", "Error"]
+
+def load_retry_jobs(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != retry_fields:
+            print(f"Not a {retry_file_name} retry file: {path}\n")
+            sys.exit(1)
+        return [(row["Name"], row["Column"], row["Url"]) for row in reader if clean_url(row["Url"])]
+
+def write_retry_file(failures):
+    path = os.path.join(output_dir, retry_file_name)
+    if not failures:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(retry_fields)
+        for file_path, url, error in failures:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            column = os.path.basename(os.path.dirname(file_path))
+            writer.writerow([name, column, url, error])
+    return path
 
 # ---- Main ----
 
 def main():
-    tasks = []
+    excel_path = prompt_excel_path()
+    if excel_path.lower().endswith(".csv"):
+        retry_jobs = load_retry_jobs(excel_path)
+        url_columns = list(dict.fromkeys(col for _, col, _ in retry_jobs))
+        print(f"Retrying {len(retry_jobs)} failed URLs from: {excel_path}")
+        jobs = iter(retry_jobs)
+        total = len(retry_jobs)
+        rows = None
+        qc_settings, qc_columns = None, []
+    else:
+        rows = load_excel(excel_path)
+        id_col = detect_id_column(rows.columns)
+
+        url_columns = detect_url_columns(rows.columns, rows.sample)
+        if not url_columns:
+            print("No columns contain URLs.")
+            sys.exit(1)
+
+        print(f"URL columns detected: {url_columns}")
+        qc_settings, qc_columns = prompt_qc_pipeline(url_columns)
+        jobs = iter_download_jobs(rows, rows.columns, id_col, url_columns)
+        # Estimate only; corrected once the last row has been read
+        total = rows.estimated_rows and rows.estimated_rows * len(url_columns)
+
+    # Create folders
+
+    for col in url_columns:
+        folder_path = os.path.join(output_dir, col.strip())
+        os.makedirs(folder_path, exist_ok=True)
+
     success_count = 0
     fail_count = 0
+    present_count = 0
+    linked_count = 0
+    new_urls = 0
     stop_flag = threading.Event()
 
     # Signal handler only sets the flag — message is printed after pbar.close()
@@ -192,26 +668,28 @@ def main():
 
     signal.signal(signal.SIGINT, handle_interrupt)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        with requests.Session() as session:
-            for row in df.itertuples(index=False):
-                if stop_flag.is_set():
-                    break
-                record_id = str(getattr(row, id_col)).strip()
-                if not record_id:
-                    continue
-                for col in url_columns:
-                    if stop_flag.is_set():
-                        break
-                    raw_url = getattr(row, col)
-                    url = clean_url(raw_url)
-                    if not url:
-                        continue
-                    tasks.append(executor.submit(download_image, session, record_id, col, url))
+    limiter = HostLimiter()
+    session = create_session()
+    breaker = CircuitBreaker()
+    failures = []
+    job_count = 0
+    manifest = DownloadManifest(os.path.join(output_dir, manifest_name))
+
+    # Per normalized URL: final path once fetched (None if it failed), or the
+    # files waiting for its in-flight download to finish.
+    resolved = {}
+    waiting = {}
+    errors = {}
+    future_jobs = {}
+    qc_results = {col: [] for col in qc_columns}
+    analyzed_count = 0
+
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if rows is None:
+            print(f"Starting download of {total} files... Press Ctrl+C to cancel.")
+        else:
+            print(f"Starting download of up to {total or 'unknown number of'} files... Press Ctrl+C to cancel.")
 
-        print(f"Starting download of {len(tasks)} files... Press Ctrl+C to cancel.")
-        completed = set()
-        
         class _TtyStream:
             """Wraps a stream and forces isatty()=True so tqdm uses \\r-based updates."""
             def __init__(self, s): self._s = s
@@ -220,36 +698,144 @@ def main():
             def isatty(self): return True
 
         pbar = tqdm(
-            total=len(tasks), desc="Downloading", unit="file",
+            total=total, desc="Downloading", unit="file",
             file=_TtyStream(sys.stdout), ascii="░█", ncols=80, dynamic_ncols=False,
             bar_format="{desc}: \033[96m{percentage:3.0f}%\033[0m|{bar}| \033[96m{n_fmt}\033[0m/\033[96m{total_fmt}\033[0m [{elapsed}<{remaining}, {rate_fmt}]",
         )
+        # Only max_pending futures exist at any time; each completion frees a
+        # slot that is refilled from the job generator.
+        # A new URL whose host has a tripped breaker is held back, pausing
+        # submissions until the host's cooldown ends.
+        pending = set()
+        held = None
+        peak_pending = 0
+        exhausted = False
         try:
-            while len(completed) < len(tasks) and not stop_flag.is_set():
-                for future in tasks:
-                    if future in completed:
+            while not stop_flag.is_set():
+                while len(pending) < max_pending:
+                    if held:
+                        key, url, file_path, col = held
+                        if breaker.remaining(url_host(url)) > 0:
+                            break
+                        held = None
+                        if col in qc_columns:
+                            future = executor.submit(analyze_image_url, session, limiter, breaker, url, file_path,
+                                                     col, qc_settings, qc_settings['keep_failed'])
+                        else:
+                            future = executor.submit(download_image, session, limiter, breaker, url, file_path)
+                        future_jobs[future] = (key, url, file_path, col)
+                        pending.add(future)
+                        continue
+                    if exhausted:
+                        break
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        if rows is not None:
+                            rows.close()
+                        pbar.total = job_count
+                        pbar.refresh()
+                        break
+                    job_count += 1
+                    record_id, col, url = job
+                    key = normalize_url(url)
+                    file_path = reserve_file_path(record_id, col, url)
+
+                    # Camera QC images are always fetched and scored, never deduplicated
+                    if col in qc_columns:
+                        held = (None, url, file_path, col)
+                        continue
+                    if key in waiting:
+                        waiting[key].append(file_path)
+                        continue
+                    if key in resolved:
+                        if resolved[key]:
+                            link_file(resolved[key], file_path)
+                            linked_count += 1
+                        else:
+                            fail_count += 1
+                            failures.append((file_path, url, errors[key]))
+                        pbar.update(1)
                         continue
-                    if future.done():
-                        completed.add(future)
-                        try:
-                            result = future.result()
-                            if result == "Downloaded":
-                                success_count += 1
-                            elif result == "Failed":
-                                fail_count += 1
-                        except Exception:
+
+                    known_path = manifest.lookup(key)
+                    if known_path:
+                        if os.path.abspath(known_path) == os.path.abspath(file_path):
+                            present_count += 1
+                        else:
+                            link_file(known_path, file_path)
+                            linked_count += 1
+                        resolved[key] = known_path
+                        pbar.update(1)
+                        continue
+
+                    new_urls += 1
+                    waiting[key] = []
+                    held = (key, url, file_path, col)
+                peak_pending = max(peak_pending, len(pending))
+                if not pending:
+                    if not held:
+                        break
+                    time.sleep(min(0.5, breaker.remaining(url_host(held[1]))))
+                    continue
+
+                # Timeout keeps the loop responsive to Ctrl+C
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, url, file_path, col = future_jobs.pop(future)
+                    try:
+                        result, detail = future.result()
+                    except Exception as e:
+                        result, detail = "Failed", str(e)
+                    if key is None:
+                        if result == "Analyzed":
+                            analyzed_count += 1
+                            qc_results[col].append(detail)
+                        else:
                             fail_count += 1
+                            failures.append((file_path, url, detail))
                         pbar.update(1)
-                threading.Event().wait(0.1)
+                        continue
+                    if result == "Downloaded":
+                        success_count += 1
+                    elif result == "Already present":
+                        present_count += 1
+                    elif result == "Failed":
+                        fail_count += 1
+
+                    duplicates = waiting.pop(key)
+                    if result in ("Downloaded", "Already present"):
+                        resolved[key] = file_path
+                        manifest.record(key, file_path, "Downloaded", detail)
+                        for dst in duplicates:
+                            link_file(file_path, dst)
+                        linked_count += len(duplicates)
+                    else:
+                        resolved[key] = None
+                        errors[key] = detail
+                        manifest.record(key, file_path, result)
+                        fail_count += len(duplicates)
+                        failures.append((file_path, url, detail))
+                        failures.extend((dst, url, detail) for dst in duplicates)
+                    pbar.update(1 + len(duplicates))
         except KeyboardInterrupt:
             stop_flag.set()
         finally:
             pbar.close()
+            manifest.close()
+            retry_path = write_retry_file(failures)
             if stop_flag.is_set():
                 print("\nInterrupt received, stopping downloads...")
                 os._exit(0)
-                    
-    print(f"All downloads attempted. {success_count} success, {fail_count} failed.")
+
+    print(f"All downloads attempted. {success_count} success, {fail_count} failed, {present_count} already present.")
+    print(f"Manifest: {new_urls} new URLs fetched, {linked_count} duplicate files linked ({manifest_name})")
+    if qc_settings:
+        print(f"Camera QC: {analyzed_count} images analyzed in memory")
+        export_qc_results(qc_results, qc_settings)
+    if retry_path:
+        print(f"Failed URLs written to: '{retry_path}' (drop it in again to retry)")
+    print(f"Peak queued tasks: {peak_pending} (window {max_pending}), CPU time: {time.process_time():.1f}s")
     print(f"Images can be found inside folder: '{output_dir}'\n")
 
 if __name__ == "__main__":
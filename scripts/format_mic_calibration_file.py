@@ -16,9 +16,14 @@ def ensure_package(pkg, imp=None):
 
 ensure_package("numpy")
 
+import csv
 import re
+import warnings
 import numpy as np
 import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
 # START SCRIPT
 
@@ -34,9 +39,70 @@ def get_output_folder(folder_name="extracted"):
     os.makedirs(output_folder, exist_ok=True)
     return output_folder
 
+def new_batch_dir(output_folder, prefix):
+    """Create and return a fresh '<prefix>_<timestamp>' folder; a counter is
+    appended when another run took the name within the same second."""
+    base = os.path.join(output_folder, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    path, n = base, 1
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            n += 1
+            path = f"{base}_{n}"
+
+# Reference frequencies every calibration curve is interpolated to
+
+REF_FREQS = np.array([
+    100.0, 106.0, 112.0, 118.0, 125.0, 132.0, 140.0, 150.0, 160.0, 170.0,
+    180.0, 190.0, 200.0, 212.0, 224.0, 236.0, 250.0, 265.0, 280.0, 300.0,
+    315.0, 335.0, 355.0, 375.0, 400.0, 425.0, 450.0, 475.0, 500.0, 530.0,
+    560.0, 600.0, 630.0, 670.0, 710.0, 750.0, 800.0, 850.0, 900.0, 950.0,
+    1000.0, 1060.0, 1120.0, 1180.0, 1250.0, 1320.0, 1400.0, 1500.0, 1600.0,
+    1700.0, 1800.0, 1900.0, 2000.0, 2120.0, 2240.0, 2360.0, 2500.0, 2650.0,
+    2800.0, 3000.0, 3150.0, 3350.0, 3550.0, 3750.0, 4000.0, 4250.0, 4500.0,
+    4750.0, 5000.0, 5300.0, 5600.0, 6000.0, 6300.0, 6700.0, 7100.0, 7500.0,
+    8000.0, 8500.0, 9000.0, 9500.0, 10000.0, 10600.0, 11200.0, 11800.0, 
+    12500.0
+])
+
+OUTPUT_HEADER = "SerialNumber\tSensitivityFactor\tFrequency\tDbValue\tLowerLimit\tUpperLimit\n"
+
 # Format calibration file
 
-def format_calibration_file(input_file, output_folder):
+def parse_data_lines(lines, first_line_no=3):
+    """Frequency and dB arrays of the data block, plus the line numbers of malformed lines.
+
+    The whole block goes through np.loadtxt; only when that fails are the
+    lines checked one by one, to skip and report the bad ones.
+    """
+    try:
+        with warnings.catch_warnings():
+            # an empty block is reported below as "no valid pairs"
+            warnings.simplefilter("ignore", UserWarning)
+            data = np.loadtxt(lines, ndmin=2, comments=None)
+        if data.shape[1] == 2:
+            return data[:, 0], data[:, 1], []
+    except ValueError:
+        pass
+
+    freqs, db_vals, bad_lines = [], [], []
+    for line_no, line in enumerate(lines, start=first_line_no):
+        parts = line.split()
+        if len(parts) == 2:
+            try:
+                freq, db_val = map(float, parts)
+                freqs.append(freq)
+                db_vals.append(db_val)
+            except ValueError:
+                bad_lines.append(line_no)
+        elif parts:
+            bad_lines.append(line_no)
+    return np.array(freqs), np.array(db_vals), bad_lines
+
+def read_calibration(input_file):
+    """Serial number, sensitivity factor, frequency and dB arrays, and malformed line numbers of a calibration .txt."""
     # --- Step 0: Validate file extension ---
     if not input_file.lower().endswith(".txt"):
         raise ValueError("Input file must be a .txt file")
@@ -65,72 +131,223 @@ def format_calibration_file(input_file, output_folder):
         raise ValueError("Invalid SensitivityFactor or SerialNumber format")
 
     # --- Step 3: Extract frequency/dB data ---
-    freqs, db_vals = [], []
-    bad_lines = 0
-    for line in lines[2:]:
-        parts = line.strip().split()
-        if len(parts) == 2:
-            try:
-                freq, db_val = map(float, parts)
-                freqs.append(freq)
-                db_vals.append(db_val)
-            except ValueError:
-                bad_lines += 1
-        elif line.strip():
-            bad_lines += 1
+    freqs, db_vals, bad_lines = parse_data_lines(lines[2:])
 
-    if not freqs:
+    if not freqs.size:
         raise ValueError("No valid frequency/dB pairs found in file")
 
-    if bad_lines > 0:
-        print(f"Warning: Skipped {bad_lines} malformed data lines")
-
-    freqs = np.array(freqs)
-    db_vals = np.array(db_vals)
-
-    # --- Step 4: Reference frequencies ---
-    ref_freqs = np.array([
-        100.0, 106.0, 112.0, 118.0, 125.0, 132.0, 140.0, 150.0, 160.0, 170.0,
-        180.0, 190.0, 200.0, 212.0, 224.0, 236.0, 250.0, 265.0, 280.0, 300.0,
-        315.0, 335.0, 355.0, 375.0, 400.0, 425.0, 450.0, 475.0, 500.0, 530.0,
-        560.0, 600.0, 630.0, 670.0, 710.0, 750.0, 800.0, 850.0, 900.0, 950.0,
-        1000.0, 1060.0, 1120.0, 1180.0, 1250.0, 1320.0, 1400.0, 1500.0, 1600.0,
-        1700.0, 1800.0, 1900.0, 2000.0, 2120.0, 2240.0, 2360.0, 2500.0, 2650.0,
-        2800.0, 3000.0, 3150.0, 3350.0, 3550.0, 3750.0, 4000.0, 4250.0, 4500.0,
-        4750.0, 5000.0, 5300.0, 5600.0, 6000.0, 6300.0, 6700.0, 7100.0, 7500.0,
-        8000.0, 8500.0, 9000.0, 9500.0, 10000.0, 10600.0, 11200.0, 11800.0, 
-        12500.0
-    ])
-
-    # --- Step 5: Interpolate values ---
-    ref_db_vals = np.interp(ref_freqs, freqs, db_vals)
-
-    # --- Step 6: Define output folder ---
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    extracted_dir = os.path.join(script_dir, output_folder)
-    os.makedirs(extracted_dir, exist_ok=True)
+    return serial_number, sensitivity_factor, freqs, db_vals, bad_lines
 
-    output_file = os.path.join(extracted_dir, f"{serial_number}_filtered.txt")
+def output_lines(serial_number, sensitivity_factor, ref_db_vals):
+    # Formatting plain floats is several times faster than numpy scalars
+    prefix = f"{serial_number}\t{sensitivity_factor:.2f}\t"
+    return [f"{prefix}{freq:.1f}\t{db_val:.2f}\t-17.00\t-33.00\n"
+            for freq, db_val in zip(REF_FREQS.tolist(), np.asarray(ref_db_vals).tolist())]
 
-    # --- Step 7: Write output ---
+def write_formatted_file(serial_number, sensitivity_factor, ref_db_vals, output_folder):
+    os.makedirs(output_folder, exist_ok=True)
+    output_file = os.path.join(output_folder, f"{serial_number}_filtered.txt")
     with open(output_file, "w") as f:
-        f.write("SerialNumber\tSensitivityFactor\tFrequency\tDbValue\tLowerLimit\tUpperLimit\n")
-        for freq, db_val in zip(ref_freqs, ref_db_vals):
-            f.write(f"{serial_number}\t{sensitivity_factor:.2f}\t{freq:.1f}\t{db_val:.2f}\t-17.00\t-33.00\n")
+        f.write(OUTPUT_HEADER)
+        f.writelines(output_lines(serial_number, sensitivity_factor, ref_db_vals))
+    return output_file
+
+def format_calibration_file(input_file, output_folder):
+    serial_number, sensitivity_factor, freqs, db_vals, bad_lines = read_calibration(input_file)
+
+    if bad_lines:
+        print(f"Warning: Skipped {len(bad_lines)} malformed data lines")
+
+    # --- Step 4: Interpolate values to the reference frequencies ---
+    ref_db_vals = np.interp(REF_FREQS, freqs, db_vals)
+
+    # --- Step 5: Write output ---
+    write_formatted_file(serial_number, sensitivity_factor, ref_db_vals, output_folder)
 
     print(f"Formatted file saved to: {output_folder}/{serial_number}_filtered.txt\n")
 
+# ---- Batch mode ----
+# A folder of calibration files is formatted in a process pool. Files are
+# tiny, so they are handed to the workers in chunks to keep the pool busy.
+
+BATCH_CHUNK_FILES = 64
+
+# Malformed line numbers listed per file in the batch log
+MAX_LISTED_BAD_LINES = 10
+
+def list_calibration_files(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(".txt") and os.path.isfile(os.path.join(folder, name)))
+
+def format_batch_file(input_file):
+    """Read and interpolate one calibration file of a batch (runs in a worker process).
+
+    Nothing is written here: files sharing a serial would race for the same
+    output, so the parent writes them once the batch is in.
+    """
+    result = {"path": input_file, "serial": None, "sensitivity": None, "values": None,
+              "bad_lines": [], "error": None}
+    try:
+        serial_number, sensitivity_factor, freqs, db_vals, bad_lines = read_calibration(input_file)
+        ref_db_vals = np.interp(REF_FREQS, freqs, db_vals)
+        result.update(serial=serial_number, sensitivity=sensitivity_factor,
+                      values=ref_db_vals, bad_lines=bad_lines)
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    return result
+
+# ---- Combined output ----
+# One row per serial and one column per reference frequency, in a single
+# CSV or Parquet file, with an index by serial next to it. A station loads
+# a whole shipment from it instead of opening a file per microphone.
+
+COMBINED_FORMATS = ("csv", "parquet")
+
+WIDE_COLUMNS = (["SerialNumber", "SensitivityFactor", "LowerLimit", "UpperLimit"]
+                + [f"{freq:.1f}" for freq in REF_FREQS.tolist()])
+
+def write_wide_csv(curves, path):
+    """Write the curves with values at 2 decimals like the text files; returns each row's byte offset."""
+    offsets = []
+    with open(path, "wb") as f:
+        f.write((",".join(WIDE_COLUMNS) + "\n").encode("ascii"))
+        for serial_number, sensitivity_factor, ref_db_vals in curves:
+            offsets.append(f.tell())
+            values = ",".join(f"{db_val:.2f}" for db_val in np.asarray(ref_db_vals).tolist())
+            f.write(f"{serial_number},{sensitivity_factor:.2f},-17.00,-33.00,{values}\n".encode("ascii"))
+    return offsets
+
+def write_wide_parquet(curves, path):
+    """Write the curves as one Parquet table, values as float64 at full precision."""
+    ensure_package("pyarrow")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = len(curves)
+    values = np.array([c[2] for c in curves], dtype=np.float64).reshape(rows, len(REF_FREQS))
+    arrays = [
+        pa.array([c[0] for c in curves], pa.int64()),
+        pa.array([c[1] for c in curves], pa.float64()),
+        pa.array(np.full(rows, -17.0)),
+        pa.array(np.full(rows, -33.0)),
+    ] + [pa.array(values[:, i]) for i in range(len(REF_FREQS))]
+    pq.write_table(pa.Table.from_arrays(arrays, names=WIDE_COLUMNS), path)
+
+def latest_results(results):
+    """Successful results by serial; when a serial is in several files the last one in input order wins."""
+    latest = {}
+    for r in results:
+        if not r["error"]:
+            latest[r["serial"]] = r
+    return latest
+
+def write_combined_output(results, batch_dir, combined_format):
+    """Write calibration_wide.<format> and calibration_index.csv; returns the wide file's path.
+
+    Rows are sorted by serial, one per serial as picked by latest_results.
+    """
+    latest = latest_results(results)
+    serials = sorted(latest)
+    curves = [(serial, latest[serial]["sensitivity"], latest[serial]["values"]) for serial in serials]
+
+    wide_path = os.path.join(batch_dir, f"calibration_wide.{combined_format}")
+    if combined_format == "parquet":
+        write_wide_parquet(curves, wide_path)
+        offsets = None
+    else:
+        offsets = write_wide_csv(curves, wide_path)
+
+    with open(os.path.join(batch_dir, "calibration_index.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["SerialNumber", "Row"] + (["ByteOffset"] if offsets else []) + ["SourceFile"])
+        for row, serial in enumerate(serials):
+            writer.writerow([serial, row] + ([offsets[row]] if offsets else [])
+                            + [os.path.basename(latest[serial]["path"])])
+    return wide_path
+
+def format_calibration_batch(input_folder, output_folder, workers=None, combined_format=None):
+    """Format every calibration .txt in input_folder; returns the results.
+
+    By default each file gets its own formatted .txt plus combined_filtered.txt;
+    with a combined_format all curves go into one wide file and an index instead.
+    """
+    files = list_calibration_files(input_folder)
+    if not files:
+        print(f"No .txt files found in: {input_folder}\n")
+        return []
+
+    batch_dir = new_batch_dir(output_folder, "mic_calibration")
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    print(f"🔄 Formatting {len(files)} calibration files with {workers} workers...")
+
+    if workers == 1:
+        results = [format_batch_file(path) for path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(format_batch_file, files, chunksize=BATCH_CHUNK_FILES))
+
+    ok = [r for r in results if not r["error"]]
+    log_lines = []
+    for r in results:
+        name = os.path.basename(r["path"])
+        if r["error"]:
+            log_lines.append(f"ERROR {name}: {r['error']}")
+        elif r["bad_lines"]:
+            listed = ", ".join(map(str, r["bad_lines"][:MAX_LISTED_BAD_LINES]))
+            more = " ..." if len(r["bad_lines"]) > MAX_LISTED_BAD_LINES else ""
+            log_lines.append(f"WARN  {name}: skipped {len(r['bad_lines'])} malformed data lines (lines {listed}{more})")
+    duplicates = [serial for serial, count in Counter(r["serial"] for r in ok).items() if count > 1]
+    for serial in duplicates:
+        names = [os.path.basename(r["path"]) for r in ok if r["serial"] == serial]
+        log_lines.append(f"DUP   {serial}: in {', '.join(names)}; the output holds the last one ({names[-1]})")
+
+    if combined_format:
+        saved = os.path.basename(write_combined_output(results, batch_dir, combined_format)) + " and calibration_index.csv"
+    else:
+        latest = latest_results(results).values()
+        for r in latest:
+            write_formatted_file(r["serial"], r["sensitivity"], r["values"], batch_dir)
+        # The same curves, one after another, in the per-file layout
+        combined_path = os.path.join(batch_dir, "combined_filtered.txt")
+        with open(combined_path, "w") as f:
+            f.write(OUTPUT_HEADER)
+            for r in latest:
+                f.writelines(output_lines(r["serial"], r["sensitivity"], r["values"]))
+        saved = "Formatted files and combined_filtered.txt"
+
+    if log_lines:
+        with open(os.path.join(batch_dir, "batch_log.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(log_lines) + "\n")
+
+    errors = len(results) - len(ok)
+    warned = sum(1 for r in ok if r["bad_lines"])
+    print("-----------")
+    print(f"{len(ok)} of {len(files)} files formatted ({errors} errors, {warned} with skipped lines, "
+          f"{len(duplicates)} duplicate serials).")
+    if log_lines:
+        print("Details in batch_log.txt")
+    print(f"{saved} saved to: {batch_dir}\n")
+    return results
+
 # main
 
 def main():
-    input_file = input('Drop the path to a mic calibration .txt file: ').strip().strip('"').strip("'")
+    input_file = input('Drop the path to a mic calibration .txt file (or a folder for a batch): ').strip().strip('"').strip("'")
     output_folder = get_output_folder("extracted")
+    if os.path.isdir(input_file):
+        combined_format = input(f"Write one combined file instead of a file per mic? ({'/'.join(COMBINED_FORMATS)}, Enter for a file per mic): ").strip().lower()
+        if combined_format and combined_format not in COMBINED_FORMATS:
+            print(f"Unknown format '{combined_format}', writing a file per mic.")
+            combined_format = None
+        results = format_calibration_batch(input_file, output_folder, combined_format=combined_format or None)
+        return 0 if results and all(not r["error"] for r in results) else 1
     print(f"Using file: {os.path.basename(input_file)}")
     format_calibration_file(input_file, output_folder)
+    return 0
         
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         sys.exit(1)
     except Exception as e:
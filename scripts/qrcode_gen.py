@@ -15,9 +15,23 @@ def ensure_package(pkg, imp=None):
 
 ensure_package("qrcode")
 ensure_package("Pillow", "PIL")
+ensure_package("charset-normalizer", "charset_normalizer")
 
 import qrcode
+import argparse
+import csv
+import io
 import os
+import re
+import struct
+import time
+import zlib
+from itertools import repeat
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from PIL import Image, ImageDraw, ImageFont
+from csv_encoding import detect_encoding
 
 # Helper for dynamic output folder
 def get_output_folder(folder_name="extracted"):
@@ -30,8 +44,21 @@ def get_output_folder(folder_name="extracted"):
     os.makedirs(output_folder, exist_ok=True)
     return output_folder
 
+def new_batch_dir(output_folder, prefix):
+    """Create and return a fresh '<prefix>_<timestamp>' folder; a counter is
+    appended when another run took the name within the same second."""
+    base = os.path.join(output_folder, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    path, n = base, 1
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            n += 1
+            path = f"{base}_{n}"
+
 # Script
-def gen_qrcode(data, output_folder):
+def make_qr(data):
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -40,6 +67,10 @@ def gen_qrcode(data, output_folder):
     )
     qr.add_data(data)
     qr.make(fit=True)
+    return qr
+
+def gen_qrcode(data, output_folder):
+    qr = make_qr(data)
 
     img = qr.make_image(fill_color="black", back_color="white")
 
@@ -47,29 +78,343 @@ def gen_qrcode(data, output_folder):
     extension = ".png"
     counter = 1
 
+    # one directory listing instead of an exists() probe per taken name
+    taken = set(os.listdir(output_folder))
     filename = f"{base_name}{extension}"
-    full_path = os.path.join(output_folder, filename)
-
-    while os.path.exists(full_path):
+    while filename in taken:
         filename = f"{base_name}_{counter}{extension}"
-        full_path = os.path.join(output_folder, filename)
         counter += 1
+    full_path = os.path.join(output_folder, filename)
 
     img.save(full_path)
     print(f"QR Code generated and saved to: {full_path}")
     print("=============================")
     qr.print_ascii(invert=True)
-    
+
+# ---- Batch mode ----
+# Serial numbers are read from a column of a CSV or Excel file and rendered
+# in a process pool, one PNG per serial, optionally also laid out on a
+# printable PDF label sheet.
+
+# Codes handed to a worker at a time; each one renders in a few milliseconds
+BATCH_CHUNK_CODES = 64
+
+# Label sheet: A4 at 300 dpi, LABEL_COLUMNS x LABEL_ROWS labels per page
+PAGE_SIZE = (2480, 3508)
+PAGE_DPI = 300
+PAGE_MARGIN = 120
+LABEL_COLUMNS = 5
+LABEL_ROWS = 8
+LABEL_FONT_SIZE = 32
+
+def read_rows(path):
+    """Non-empty rows of a .csv or .xlsx file, as lists of strings."""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        ensure_package("openpyxl")
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = [["" if v is None else str(v) for v in row]
+                    for row in wb.active.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+    else:
+        with open(path, "r", encoding=detect_encoding(path), newline="") as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            rows = list(csv.reader(f, dialect))
+
+    rows = [row for row in rows if any(cell.strip() for cell in row)]
+    if not rows:
+        raise ValueError(f"No data found in {path}")
+    return rows
+
+def serial_shape(value):
+    return re.sub(r"[A-Za-z]", "A", re.sub(r"\d", "9", value))
+
+def header_guess(rows):
+    """True if the first row looks like a header, False if it looks like a serial, None if unsure.
+
+    Serials carry digits and share a shape (letters and digits in the same
+    places); a header name has no digits.
+    """
+    first = rows[0][0].strip() if rows[0] else ""
+    values = [row[0].strip() for row in rows[1:6] if row and row[0].strip()]
+    has_digit = re.compile(r"\d").search
+    if has_digit(first):
+        if not values or serial_shape(first) in {serial_shape(v) for v in values}:
+            return False
+    elif values and all(has_digit(v) for v in values):
+        return True
+    return None
+
+def read_serials(path, column=None, header=None):
+    """Non-empty values of column (header name, default: first column) in a .csv or .xlsx file.
+
+    A column name implies a header row. Without one, header says whether
+    the first row is a header; None guesses with header_guess and keeps the
+    first row when unsure, so no serial is dropped.
+    """
+    rows = read_rows(path)
+    if column:
+        header = [cell.strip() for cell in rows[0]]
+        lowered = [h.lower() for h in header]
+        if column.strip().lower() not in lowered:
+            raise ValueError(f"Column '{column}' not found. Available columns: {', '.join(header)}")
+        index = lowered.index(column.strip().lower())
+        rows = rows[1:]
+    else:
+        index = 0
+        if header is None:
+            header = header_guess(rows)
+            if header is None:
+                print(f"⚠️  Could not tell whether '{rows[0][0].strip()}' is a header; it is kept as a serial number")
+        if header:
+            rows = rows[1:]
+    return [row[index].strip() for row in rows if index < len(row) and row[index].strip()]
+
+def serial_file_names(serials):
+    """A PNG name per serial, with characters Windows does not allow replaced; repeats are numbered.
+
+    Names are compared case-insensitively, as on Windows "AB.png" and "ab.png" are the same file.
+    """
+    names = []
+    used = set()
+    for serial in serials:
+        stem = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", serial).strip(" .") or "qr"
+        name, n = f"{stem}.png", 1
+        while name.lower() in used:
+            n += 1
+            name = f"{stem}_{n}.png"
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+def render_qr_file(data, path):
+    """Render one code of a batch to a PNG (runs in a worker process); returns an error or None."""
+    try:
+        make_qr(data).make_image(fill_color="black", back_color="white").save(path)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return None
+
+# ---- Fast path ----
+# Serials of a lot share one QR version, so the version is fixed up front and
+# one mask is used for every code; that skips the 8-mask penalty search, which
+# is most of make_qr's time. Modules are drawn into a preallocated 1-bit
+# bitmap and written as PNG with zlib directly, without building a PIL image.
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COMPRESS_LEVEL = 6
+
+def png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+class FastQrRenderer:
+    """Renders codes of one version and mask, same size and settings as make_qr, to PNG bytes."""
+
+    def __init__(self, version, mask_pattern, box_size=10, border=4):
+        self.qr = qrcode.QRCode(
+            version=version,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=box_size,
+            border=border,
+            mask_pattern=mask_pattern,
+        )
+        self.box_size = box_size
+        self.border = border
+        self.size = (version * 4 + 17 + 2 * border) * box_size
+        # one PNG scanline: filter byte 0, then the pixels packed 8 per byte (1 = white)
+        self.row_bytes = (self.size + 7) // 8
+        self.stride = 1 + self.row_bytes
+        self.bitmap = bytearray((b"\x00" + b"\xff" * self.row_bytes) * self.size)
+        self.dark = "0" * box_size
+        self.light = "1" * box_size
+        self.quiet = "1" * (border * box_size)
+        self.pad = "1" * (self.row_bytes * 8 - self.size)
+        self.header = PNG_SIGNATURE + png_chunk(b"IHDR", struct.pack(">IIBBBBB", self.size, self.size, 1, 0, 0, 0, 0))
+        self.trailer = png_chunk(b"IEND", b"")
+
+    def render(self, data):
+        """PNG bytes of data's code; raises qrcode's DataOverflowError if data needs a larger version."""
+        qr = self.qr
+        qr.clear()
+        qr.add_data(data)
+        qr.make(fit=False)
+
+        bitmap, stride, box = self.bitmap, self.stride, self.box_size
+        dark, light = self.dark, self.light
+        y = self.border * box
+        for modules in qr.modules:
+            bits = self.quiet + "".join(dark if m else light for m in modules) + self.quiet + self.pad
+            line = int(bits, 2).to_bytes(self.row_bytes, "big")
+            for offset in range(y * stride + 1, (y + box) * stride + 1, stride):
+                bitmap[offset:offset + self.row_bytes] = line
+            y += box
+        return self.header + png_chunk(b"IDAT", zlib.compress(bitmap, PNG_COMPRESS_LEVEL)) + self.trailer
+
+def plan_fast_path(serials):
+    """Version and mask for a lot, planned on a serial of its most common length.
+
+    Returns make_qr's version and mask for that serial; codes that don't fit
+    the version fall back to make_qr in render_qr_file_fast.
+    """
+    length = Counter(len(s) for s in serials).most_common(1)[0][0]
+    qr = make_qr(max((s for s in serials if len(s) == length), key=lambda s: len(s.encode("utf-8"))))
+    return qr.version, qr.best_mask_pattern()
+
+# One renderer per worker process and (version, mask), reused for every code
+_fast_renderers = {}
+
+def render_qr_file_fast(data, path, version, mask_pattern):
+    """render_qr_file through the fast path (runs in a worker process); returns an error or None."""
+    renderer = _fast_renderers.get((version, mask_pattern))
+    if renderer is None:
+        renderer = _fast_renderers[(version, mask_pattern)] = FastQrRenderer(version, mask_pattern)
+    try:
+        png = renderer.render(data)
+    except qrcode.exceptions.DataOverflowError:
+        # longer than the lot's serials; render it on its own
+        return render_qr_file(data, path)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    with open(path, "wb") as f:
+        f.write(png)
+    return None
+
+def benchmark(count):
+    """Print codes/sec of make_qr + PIL and of the fast path for count serial-style codes."""
+    serials = [f"PSE48-2410{i:06d}" for i in range(count)]
+
+    start = time.perf_counter()
+    for serial in serials:
+        make_qr(serial).make_image(fill_color="black", back_color="white").save(io.BytesIO())
+    default_rate = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    renderer = FastQrRenderer(*plan_fast_path(serials))
+    for serial in serials:
+        renderer.render(serial)
+    fast_rate = count / (time.perf_counter() - start)
+
+    print(f"make_qr + PIL: {default_rate:8.0f} codes/sec")
+    print(f"fast path:     {fast_rate:8.0f} codes/sec ({fast_rate / default_rate:.1f}x)")
+
+def label_font():
+    try:
+        return ImageFont.load_default(size=LABEL_FONT_SIZE)
+    except TypeError:
+        # Pillow before 10.1 only has the small bitmap font
+        return ImageFont.load_default()
+
+def write_label_sheet(items, pdf_path):
+    """Lay (serial, png path) items out on A4 pages with the serial under each code; returns the page count."""
+    font = label_font()
+    cell_w = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // LABEL_COLUMNS
+    cell_h = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // LABEL_ROWS
+    qr_box = (cell_w - 20, cell_h - LABEL_FONT_SIZE - 30)
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+
+    # 1-bit pages keep a 5k-code sheet around 150 MB while Pillow assembles the PDF
+    pages = []
+    for start in range(0, len(items), per_page):
+        page = Image.new("1", PAGE_SIZE, 1)
+        draw = ImageDraw.Draw(page)
+        for i, (serial, png_path) in enumerate(items[start:start + per_page]):
+            x = PAGE_MARGIN + (i % LABEL_COLUMNS) * cell_w
+            y = PAGE_MARGIN + (i // LABEL_COLUMNS) * cell_h
+            with Image.open(png_path) as img:
+                img = img.convert("1")
+                if img.width > qr_box[0] or img.height > qr_box[1]:
+                    img.thumbnail(qr_box, Image.NEAREST)
+                page.paste(img, (x + (cell_w - img.width) // 2, y))
+            text_w = draw.textlength(serial, font=font)
+            draw.text((x + (cell_w - text_w) / 2, y + img.height + 4), serial, fill=0, font=font)
+        pages.append(page)
+    pages[0].save(pdf_path, save_all=True, append_images=pages[1:], resolution=PAGE_DPI)
+    return len(pages)
+
+def gen_qrcode_batch(input_file, output_folder, column=None, pdf=False, workers=None, fast=True, header=None):
+    """Render a QR code per serial in input_file; returns the exit code.
+
+    column and header are passed to read_serials. The fast path gives every code the version and mask planned by
+    plan_fast_path; with fast=False each code gets make_qr's own smallest version and best mask.
+    """
+    serials = read_serials(input_file, column, header)
+    if not serials:
+        print("No serial numbers found.\n")
+        return 1
+    print(f"📄 Read {len(serials)} serial numbers from {os.path.basename(input_file)}")
+
+    batch_dir = new_batch_dir(output_folder, "qr_batch")
+    paths = [os.path.join(batch_dir, name) for name in serial_file_names(serials)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(serials)))
+    print(f"🔄 Rendering {len(serials)} QR codes with {workers} workers...")
+
+    if fast:
+        version, mask_pattern = plan_fast_path(serials)
+        render, extra = render_qr_file_fast, (repeat(version), repeat(mask_pattern))
+    else:
+        render, extra = render_qr_file, ()
+    if workers == 1:
+        errors = list(map(render, serials, paths, *extra))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            errors = list(executor.map(render, serials, paths, *extra, chunksize=BATCH_CHUNK_CODES))
+
+    failed = [(serial, error) for serial, error in zip(serials, errors) if error]
+    for serial, error in failed:
+        print(f"❌ {serial}: {error}")
+    repeats = len(serials) - len(set(serials))
+    if repeats:
+        print(f"⚠️  {repeats} serial numbers appear more than once; their files are numbered")
+
+    print("-----------")
+    print(f"{len(serials) - len(failed)} of {len(serials)} QR codes saved to: {batch_dir}")
+    if pdf:
+        items = [(serial, path) for serial, path, error in zip(serials, paths, errors) if not error]
+        pdf_path = os.path.join(batch_dir, "labels.pdf")
+        if items:
+            pages = write_label_sheet(items, pdf_path)
+            print(f"Label sheet ({pages} pages) saved to: {pdf_path}")
+    print()
+    return 1 if failed else 0
+
 # Main
-def main():
-    data = input("Enter the text or URL for your QR code: ")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        parser = argparse.ArgumentParser(description="Generate QR codes.")
+        parser.add_argument("--benchmark", type=int, metavar="N", required=True,
+                            help="Render N serial-style codes with make_qr and the fast path and print codes/sec")
+        benchmark(parser.parse_args(argv).benchmark)
+        return 0
+
+    data = input("Enter the text or URL for your QR code (or drop a .csv/.xlsx of serial numbers for a batch): ")
     output_folder = get_output_folder("extracted")
+    path = data.strip().strip('"').strip("'")
+    if path.lower().endswith((".csv", ".xlsx", ".xlsm")) and os.path.isfile(path):
+        column = input("Column with the serial numbers (header name, Enter for the first column): ").strip()
+        header = None
+        if not column:
+            rows = read_rows(path)
+            header = header_guess(rows)
+            if header is None:
+                answer = input(f"Is the first row ('{rows[0][0].strip()}') a header? (y/N): ")
+                header = answer.strip().lower() in ("y", "yes")
+        pdf = input("Also write a printable PDF label sheet? (y/N): ").strip().lower() in ("y", "yes")
+        return gen_qrcode_batch(path, output_folder, column or None, pdf, header=header)
     gen_qrcode(data, output_folder)
+    return 0
 
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         sys.exit(1)
     except Exception as e:
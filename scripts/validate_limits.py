@@ -15,12 +15,27 @@ def ensure_package(pkg, imp=None):
             sys.exit(1)
 
 ensure_package("openpyxl")
+ensure_package("numpy")
+ensure_package("charset-normalizer", "charset_normalizer")
 
+import argparse
 import csv
+import glob
 import json
 import os
 import openpyxl
+import numpy as np
+import pickle
 import re
+import select
+import struct
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from itertools import chain, islice
+from operator import itemgetter
+from csv_encoding import detect_encoding
 
 # Output folder logic
 
@@ -33,52 +48,123 @@ else:
 os.makedirs(output_dir, exist_ok=True)
 config_path = os.path.join(script_dir, "config.json")
 
+# Rows held in memory at once while validating
+CHUNK_ROWS = 5000
+
+# Characters of a JSON dump read at a time when streaming its items
+JSON_READ_SIZE = 1 << 20
+
+# Watch mode: seconds between folder checks, and size at which the rolling
+# report is rotated to watch_report.1.txt
+WATCH_INTERVAL = 1.0
+WATCH_REPORT_MAX_BYTES = 5 * 1024 * 1024
+
+# Flattened limits are cached next to their JSON as '<name>.compiled.pickle'
+LIMITS_CACHE_SUFFIX = ".compiled.pickle"
+LIMITS_CACHE_VERSION = 1
+
 # Parser functions
+# Each parser is a generator yielding one dict per data row, so a file is
+# never held in memory as a whole list of rows.
 
 def parse_csv(path, skip_rows):
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "r", encoding=detect_encoding(path)) as f:
         for _ in range(skip_rows):
-            next(f)
-        reader = csv.DictReader(f, delimiter=';')
-        if not reader.fieldnames:
+            next(f, None)
+        reader = csv.reader(f, delimiter=';')
+        # Headers are normalized once; each row is then a plain zip
+        headers = [normalize_key(h) for h in next(reader, [])]
+        if not headers:
             raise ValueError("No headers found in CSV file.")
-        return [
-            {normalize_key(k): v for k, v in row.items()}
-            for row in reader
-        ]
+        width = len(headers)
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            yield dict(zip(headers, row))
 
 def parse_xlsx(path, skip_rows=None):
     wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
-    sheet = wb.active
-    rows = list(sheet.iter_rows(values_only=True))
-    headers = [normalize_key(str(cell)) if cell is not None else "" for cell in rows[0]]
-    return [
-        {headers[i]: str(cell) if cell is not None else "" for i, cell in enumerate(row)}
-        for row in rows[1:]
-    ]
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            return
+        headers = [normalize_key(str(cell)) if cell is not None else "" for cell in header_row]
+        for row in rows:
+            yield {headers[i]: str(cell) if cell is not None else "" for i, cell in enumerate(row)}
+    finally:
+        wb.close()
 
-def parse_txt_json_array(path, skip_rows=None):
+# Fields of one TaskSection row and their defaults; SerialNumber comes from the item
+NETWORK_SECTION_FIELDS = {"Name": "", "Value": "", "IsDataSet": False, "NetworkChartType": ""}
+
+JSON_WHITESPACE = re.compile(r"\s*")
+
+def stream_json_array(f):
+    """Decode the items of a top-level JSON array one at a time.
+
+    Only a window of the file is held in memory. An item counts as decoded
+    once the ',' or ']' after it has been read, so an item (or number) cut off
+    at the end of the window is decoded again after reading further.
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(JSON_READ_SIZE)
+    pos = JSON_WHITESPACE.match(buf).end()
+    if not buf.startswith("[", pos):
+        yield from json.loads(buf + f.read())
+        return
+
+    pos += 1
+    eof = False
+    first = True
+    while True:
+        try:
+            pos = JSON_WHITESPACE.match(buf, pos).end()
+            if first and buf.startswith("]", pos):
+                end, after = None, pos
+            else:
+                item, end = decoder.raw_decode(buf, pos)
+                after = JSON_WHITESPACE.match(buf, end).end()
+                if after == len(buf) or buf[after] not in ",]":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, after)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(max(JSON_READ_SIZE, len(buf) - pos))
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+
+        if end is not None:
+            yield item
+        if buf[after] == "]":
+            rest = buf[after + 1:] + f.read()
+            if rest.strip():
+                raise json.JSONDecodeError("Extra data", rest, len(rest) - len(rest.lstrip()))
+            return
+        pos = after + 1
+        first = False
+
+def load_json_array(path):
     with open(path, "r", encoding="utf-8") as f:
         try:
-            data = json.load(f)
+            yield from stream_json_array(f)
         except json.JSONDecodeError as e:
             print(f"Error decoding JSON from TXT file: {e}")
             sys.exit(1)
 
-    rows = []
-    for item in data:
+def parse_txt_json_array(path, skip_rows=None):
+    for item in load_json_array(path):
         serial = item.get("SerialNumber", "N/A")
         for task in item.get("NetworkTasks", []):
             for section in task.get("TaskSections", []):
-                row = {
-                    "SerialNumber": serial,
-                    "Name": section.get("Name", ""),
-                    "Value": section.get("Value", ""),
-                    "IsDataSet": section.get("IsDataSet", False),
-                    "NetworkChartType": section.get("NetworkChartType", "")
-                }
-                rows.append(row)
-    return rows
+                row = {"SerialNumber": serial}
+                for field, default in NETWORK_SECTION_FIELDS.items():
+                    row[field] = section.get(field, default)
+                yield row
 
 # Parser mapping
 
@@ -88,6 +174,13 @@ PARSERS = {
     "parse_txt_json_array": parse_txt_json_array,
 }
 
+# File extension of a parser's input, for profiles without an "ext" in config.json
+PARSER_EXTENSIONS = {
+    "parse_csv": ".csv",
+    "parse_xlsx": ".xlsx",
+    "parse_txt_json_array": ".txt",
+}
+
 # Utilities
 
 def normalize_key(key: str) -> str:
@@ -103,6 +196,9 @@ def get_field(row, field_names):
             return row.get(name)
     return None
 
+def profile_extension(profile):
+    return (profile.get("ext") or PARSER_EXTENSIONS.get(profile.get("parser"), "")).lower()
+
 def load_config(path="config.json"):
     if not os.path.exists(path):
         print(f"Config file '{path}' not found.")
@@ -110,12 +206,43 @@ def load_config(path="config.json"):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def read_limits_cache(cache_path, stamp):
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("stamp") != stamp:
+        return None
+    return cached.get("limits")
+
+def write_limits_cache(cache_path, stamp, flat_limits):
+    # Best effort: a read-only limits folder just means no cache
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"stamp": stamp, "limits": flat_limits}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
 def load_limits(json_path, root_key):
     json_path = os.path.join(script_dir, json_path) if not os.path.isabs(json_path) else json_path
     if not os.path.exists(json_path):
         print(f"Limits file not found: {json_path}")
         sys.exit(1)
-        
+
+    # The cache is reused only while the JSON is unchanged (mtime and size)
+    st = os.stat(json_path)
+    stamp = (LIMITS_CACHE_VERSION, st.st_mtime_ns, st.st_size, root_key)
+    cache_path = os.path.splitext(json_path)[0] + LIMITS_CACHE_SUFFIX
+    flat_limits = read_limits_cache(cache_path, stamp)
+    if flat_limits is not None:
+        return flat_limits
+
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
@@ -124,71 +251,796 @@ def load_limits(json_path, root_key):
         for limit in section.get("limits", []):
             key = normalize_key(limit["key"])
             flat_limits[key] = (limit["lowerLimit"], limit["upperLimit"])
+    write_limits_cache(cache_path, stamp, flat_limits)
     return flat_limits
 
-def validate_rows(rows, limits_dict, field_map):
+# One failed check. kind is "missing_key", "missing" or "out_of_range";
+# label is the name shown in the message (the limit key, or the section
+# name for keyed rows).
+Failure = namedtuple("Failure", "row serial kind key label value low high")
+
+def format_failure(failure):
+    prefix = f"[Row {failure.row} | SN: {failure.serial}]"
+    if failure.kind == "missing_key":
+        return f"{prefix} Missing key '{failure.key}' (Name: '{failure.label}')"
+    if failure.kind == "missing":
+        return f"{prefix} Missing value for '{failure.label}'"
+    return f"{prefix} ❌ '{failure.label}' = {failure.value} (Out of range: {format_range(failure.low, failure.high)})"
+
+def row_serial(row, field_map):
+    serial = get_field(row, field_map.get("serial", ["SerialNumber"])) or "N/A"
+    return serial.strip() if isinstance(serial, str) else "N/A"
+
+def format_range(low, high):
+    return f"{low if low is not None else '-∞'}–{high if high is not None else '∞'}"
+
+def compile_limits(limits_dict):
+    """Split limits into key list and aligned lower/upper bound arrays (None -> ∓inf)."""
+    keys = list(limits_dict)
+    low = np.array([lo if lo is not None else -np.inf for lo, _ in limits_dict.values()], dtype=float)
+    high = np.array([hi if hi is not None else np.inf for _, hi in limits_dict.values()], dtype=float)
+    return keys, low, high
+
+def to_float(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return np.nan
+
+def column_to_floats(column):
+    """Convert one object column of cell strings (blanks already "nan").
+
+    numpy converts the whole column in one C loop; decimal commas and
+    unparseable cells (NaN, so never out of range) are only dealt with for a
+    column where that fails.
+    """
+    try:
+        return column.astype(float)
+    except (TypeError, ValueError):
+        pass
+    cells = [cell.replace(",", ".") for cell in column.tolist()]
+    try:
+        return np.fromiter(map(float, cells), dtype=float, count=len(cells))
+    except ValueError:
+        return np.fromiter(map(to_float, cells), dtype=float, count=len(cells))
+
+def value_matrix(rows, keys):
+    """Raw cell values of every row for every key, as a rows × keys object array."""
+    getter = itemgetter(*keys) if len(keys) > 1 else (lambda row: (row[keys[0]],))
+    try:
+        table = list(map(getter, rows))
+    except KeyError:
+        # Some row lacks a limit column entirely; treat it as blank
+        table = [tuple(row.get(key, "") for key in keys) for row in rows]
+    matrix = np.empty((len(rows), len(keys)), dtype=object)
+    matrix[:] = table
+    return matrix
+
+def validate_wide_rows(rows, limits_dict, field_map, first_row=1, compiled=None):
+    """Check one column per limit key for every row at once.
+
+    compiled is compile_limits(limits_dict), passed in to reuse it across chunks.
+    """
+    keys, low, high = compiled or compile_limits(limits_dict)
+    if not keys or not rows:
+        return []
+
+    raw = value_matrix(rows, keys)
+    missing = raw == ""
+    raw[missing] = "nan"
+    values = np.empty(raw.shape, dtype=float)
+    for j in range(len(keys)):
+        values[:, j] = column_to_floats(raw[:, j])
+
+    out_of_range = (values < low) | (values > high)
+    # np.nonzero walks row by row, so messages keep the per-row, per-key order
+    hit_rows, hit_cols = np.nonzero(missing | out_of_range)
+    hit_missing = missing[hit_rows, hit_cols].tolist()
+    hit_values = values[hit_rows, hit_cols].tolist()
+
     results = []
-    for i, row in enumerate(rows, start=1):
-        serial = get_field(row, field_map.get("serial", ["SerialNumber"])) or "N/A"
+    serials = {}
+    for i, j, is_missing, val in zip(hit_rows.tolist(), hit_cols.tolist(), hit_missing, hit_values):
+        serial = serials.get(i)
+        if serial is None:
+            serial = serials[i] = row_serial(rows[i], field_map)
+        key = keys[j]
+        low_j, high_j = limits_dict[key]
+        if is_missing:
+            results.append(Failure(first_row + i, serial, "missing", key, key, None, low_j, high_j))
+        else:
+            results.append(Failure(first_row + i, serial, "out_of_range", key, key, val, low_j, high_j))
+    return results
+
+def validate_keyed_rows(rows, limits_dict, field_map, first_row=1):
+    """Check rows that each carry one measurement as key/value fields."""
+    results = []
+    key_field = field_map.get("key", "NetworkChartType")
+    value_field = field_map.get("value", "Value")
+    name_field = field_map.get("name", "Name")
+
+    for i, row in enumerate(rows, start=first_row):
+        serial = row_serial(row, field_map)
+        key = row.get(key_field)
+        name = row.get(name_field, "")
+        val_str = row.get(value_field, "")
+        if not key:
+            results.append(Failure(i, serial, "missing_key", key_field, name, None, None, None))
+            continue
+        low, high = limits_dict.get(key, (None, None))
+        if val_str == "":
+            results.append(Failure(i, serial, "missing", key, name, None, low, high))
+            continue
+        try:
+            val = float(val_str)
+        except ValueError:
+            continue
+
+        label = name if name else key
+        if (low is not None and val < low) or (high is not None and val > high):
+            results.append(Failure(i, serial, "out_of_range", key, label, val, low, high))
+    return results
+
+# ---- Network JSON fast path ----
+# Keyed rows straight from the JSON dump: one walk collects serial, key,
+# name and value columns, keys are mapped to limit indexes through a dict,
+# and the bounds are checked with array comparisons.
+
+def network_serial_field(field_map):
+    """Section row field that get_field would pick for the serial, or None."""
+    names = field_map.get("serial", ["SerialNumber"])
+    if isinstance(names, str):
+        return names
+    row_fields = ["SerialNumber", *NETWORK_SECTION_FIELDS]
+    return next((name for name in names if name in row_fields), None)
+
+def network_columns_supported(field_map):
+    fields = (
+        field_map.get("key", "NetworkChartType"),
+        field_map.get("value", "Value"),
+        field_map.get("name", "Name"),
+    )
+    return all(f in NETWORK_SECTION_FIELDS for f in fields) and network_serial_field(field_map) in ("SerialNumber", None)
+
+def iter_network_columns(path, field_map, chunk_rows=CHUNK_ROWS):
+    """Yield (serials, keys, names, values) lists of roughly chunk_rows sections each."""
+    key_field = field_map.get("key", "NetworkChartType")
+    value_field = field_map.get("value", "Value")
+    name_field = field_map.get("name", "Name")
+    key_default = NETWORK_SECTION_FIELDS[key_field]
+    value_default = NETWORK_SECTION_FIELDS[value_field]
+    name_default = NETWORK_SECTION_FIELDS[name_field]
+    read_serial = network_serial_field(field_map) is not None
+
+    serials, keys, names, values = [], [], [], []
+    for item in load_json_array(path):
+        serial = (item.get("SerialNumber", "N/A") or "N/A") if read_serial else "N/A"
         serial = serial.strip() if isinstance(serial, str) else "N/A"
+        for task in item.get("NetworkTasks", []):
+            sections = task.get("TaskSections", [])
+            serials += [serial] * len(sections)
+            keys += [section.get(key_field, key_default) for section in sections]
+            names += [section.get(name_field, name_default) for section in sections]
+            values += [section.get(value_field, value_default) for section in sections]
+        if len(keys) >= chunk_rows:
+            yield serials, keys, names, values
+            serials, keys, names, values = [], [], [], []
+    if keys:
+        yield serials, keys, names, values
 
-        key_field = field_map.get("key", "NetworkChartType")
-        value_field = field_map.get("value", "Value")
-        name_field = field_map.get("name", "Name")
+def validate_network_columns(columns, limits_dict, field_map, first_row, compiled):
+    """Same checks and messages as validate_keyed_rows, for one chunk of columns."""
+    serials, keys, names, values = columns
+    limit_keys, low, high = compiled
+    key_index = {key: i for i, key in enumerate(limit_keys)}
+    n = len(keys)
 
-        if key_field in row and value_field in row:
-            key = row.get(key_field)
-            name = row.get(name_field, "")
-            val_str = row.get(value_field, "")
-            if not key:
-                results.append(f"[Row {i} | SN: {serial}] Missing key '{key_field}' (Name: '{name}')")
-                continue
-            if val_str == "":
-                results.append(f"[Row {i} | SN: {serial}] Missing value for '{name}'")
-                continue
-            try:
-                val = float(val_str)
-            except ValueError:
-                continue
+    # Unknown keys map to the extra open bound at the end of each array
+    codes = np.fromiter((key_index.get(key, -1) for key in keys), dtype=np.intp, count=n)
+    has_key = np.fromiter(map(bool, keys), dtype=bool, count=n)
+    raw = np.empty(n, dtype=object)
+    raw[:] = values
+    missing = has_key & (raw == "")
+    raw[~has_key | missing] = "nan"
+    try:
+        vals = raw.astype(float)
+    except (TypeError, ValueError):
+        vals = np.fromiter(map(to_float, raw.tolist()), dtype=float, count=n)
 
-            low, high = limits_dict.get(key, (None, None))
-            label = name if name else key
-            if (low is not None and val < low) or (high is not None and val > high):
-                range_str = f"{low if low is not None else '-∞'}–{high if high is not None else '∞'}"
-                results.append(f"[Row {i} | SN: {serial}] ❌ '{label}' = {val} (Out of range: {range_str})")
-        else:
-            for key, (low, high) in limits_dict.items():
-                raw = row.get(key, "")
-                if not raw:
-                    results.append(f"[Row {i} | SN: {serial}] Missing value for '{key}'")
-                    continue
-                try:
-                    val = float(raw.replace(",", "."))
-                except ValueError:
-                    continue
-                if (low is not None and val < low) or (high is not None and val > high):
-                    range_str = f"{low if low is not None else '-∞'}–{high if high is not None else '∞'}"
-                    results.append(f"[Row {i} | SN: {serial}] ❌ '{key}' = {val} (Out of range: {range_str})")
+    low = np.append(low, -np.inf)[codes]
+    high = np.append(high, np.inf)[codes]
+    out_of_range = has_key & ((vals < low) | (vals > high))
+    hits = np.nonzero(~has_key | missing | out_of_range)[0].tolist()
 
+    key_field = field_map.get("key", "NetworkChartType")
+    results = []
+    for i in hits:
+        serial, key, name = serials[i], keys[i], names[i]
+        if not key:
+            results.append(Failure(first_row + i, serial, "missing_key", key_field, name, None, None, None))
+            continue
+        low_i, high_i = limits_dict.get(key, (None, None))
+        if missing[i]:
+            results.append(Failure(first_row + i, serial, "missing", key, name, None, low_i, high_i))
+        else:
+            results.append(Failure(first_row + i, serial, "out_of_range", key, name if name else key,
+                                   float(vals[i]), low_i, high_i))
     return results
 
-def validate_file(path, limits_dict, parser_func, skip_rows, output_log, field_map):
-    rows = parser_func(path, skip_rows) if parser_func == parse_csv else parser_func(path)
-    results = validate_rows(rows, limits_dict, field_map)
+def iter_network_validation(path, limits_dict, field_map, stats=None):
+    compiled = compile_limits(limits_dict)
+    first_row = 1
+    for columns in iter_network_columns(path, field_map):
+        yield from validate_network_columns(columns, limits_dict, field_map, first_row, compiled)
+        first_row += len(columns[1])
+        if stats is not None:
+            stats["rows"] += len(columns[1])
+
+def iter_validation(rows, limits_dict, field_map, chunk_rows=CHUNK_ROWS, stats=None):
+    """Validate rows from any iterable CHUNK_ROWS at a time, yielding Failures in order.
+
+    stats, if given, is a dict whose "rows" count is advanced as rows are read.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    key_field = field_map.get("key", "NetworkChartType")
+    value_field = field_map.get("value", "Value")
+    # All rows of a file share one layout, so the first row picks the path
+    if key_field in first and value_field in first:
+        validate_chunk = validate_keyed_rows
+    else:
+        compiled = compile_limits(limits_dict)
+
+        def validate_chunk(chunk, limits_dict, field_map, first_row):
+            return validate_wide_rows(chunk, limits_dict, field_map, first_row, compiled)
+
+    rows = chain([first], rows)
+    first_row = 1
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield from validate_chunk(chunk, limits_dict, field_map, first_row)
+        first_row += len(chunk)
+        if stats is not None:
+            stats["rows"] += len(chunk)
+
+def validate_rows(rows, limits_dict, field_map):
+    return [format_failure(failure) for failure in iter_validation(rows, limits_dict, field_map)]
+
+def read_rows(path, parser_func, skip_rows):
+    return parser_func(path, skip_rows) if parser_func == parse_csv else parser_func(path)
+
+def iter_file_validation(path, parser_func, skip_rows, limits_dict, field_map, stats=None):
+    """Failures for one input file, taking the columnar path for network JSON dumps."""
+    if parser_func == parse_txt_json_array and network_columns_supported(field_map):
+        return iter_network_validation(path, limits_dict, field_map, stats)
+    return iter_validation(read_rows(path, parser_func, skip_rows), limits_dict, field_map, stats=stats)
+
+# ---- Structured output ----
+# Machine-readable copies of the failures, one record per Failure plus the
+# name of the file it came from. Like the text log, a file is only created
+# once there is a failure to write.
+
+RECORD_FIELDS = ("file",) + Failure._fields
+RECORD_FORMATS = ("jsonl", "csv", "parquet")
+
+class JsonlRecordWriter:
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self._out = None
+
+    def write(self, failure):
+        if self._out is None:
+            self._out = open(self.path, "w", encoding="utf-8")
+        record = dict(zip(RECORD_FIELDS, (self.source,) + failure))
+        self._out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if self._out is not None:
+            self._out.close()
+
+class CsvRecordWriter:
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self._out = None
+        self._writer = None
+
+    def write(self, failure):
+        if self._out is None:
+            self._out = open(self.path, "w", encoding="utf-8", newline="")
+            self._writer = csv.writer(self._out)
+            self._writer.writerow(RECORD_FIELDS)
+        self._writer.writerow(["" if v is None else v for v in (self.source,) + failure])
+
+    def close(self):
+        if self._out is not None:
+            self._out.close()
+
+class ParquetRecordWriter:
+    """Buffers records and writes them as Parquet row groups of CHUNK_ROWS."""
+
+    def __init__(self, path, source):
+        # Installed by prepare_record_format in the parent, not once per worker
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.source = source
+        self._schema = pa.schema([
+            ("file", pa.string()), ("row", pa.int64()), ("serial", pa.string()),
+            ("kind", pa.string()), ("key", pa.string()), ("label", pa.string()),
+            ("value", pa.float64()), ("low", pa.float64()), ("high", pa.float64()),
+        ])
+        self._buffer = []
+        self._writer = None
+
+    def write(self, failure):
+        self._buffer.append(failure)
+        if len(self._buffer) >= CHUNK_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        columns = list(zip(*self._buffer))
+        columns.insert(0, [self.source] * len(self._buffer))
+        for i in (7, 8):
+            columns[i] = [None if v is None else float(v) for v in columns[i]]
+        batch = self._pa.record_batch([list(c) for c in columns], schema=self._schema)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_batch(batch)
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+RECORD_WRITERS = {
+    "jsonl": JsonlRecordWriter,
+    "csv": CsvRecordWriter,
+    "parquet": ParquetRecordWriter,
+}
+
+def prepare_record_format(record_format):
+    """Install what record_format needs once, before any worker builds a writer."""
+    if record_format == "parquet":
+        ensure_package("pyarrow")
+
+def record_writer(output_log, record_format, source_path):
+    """Writer for '<log name>.<format>' next to output_log, or None when not requested."""
+    if not record_format:
+        return None
+    path = f"{os.path.splitext(output_log)[0]}.{record_format}"
+    return RECORD_WRITERS[record_format](path, os.path.basename(source_path))
+
+def write_results(failures, output_log, records=None):
+    """Write failures to output_log as they arrive and return how many there were.
+
+    The log is only (re)created once there is something to report. records is
+    an optional structured writer that receives every failure as well.
+    """
+    out = None
+    count = 0
+    try:
+        for failure in failures:
+            if out is None:
+                os.makedirs(os.path.dirname(output_log), exist_ok=True)
+                out = open(output_log, "w", encoding="utf-8")
+            else:
+                out.write("\n")
+            out.write(format_failure(failure))
+            if records is not None:
+                records.write(failure)
+            count += 1
+    finally:
+        if out is not None:
+            out.close()
+        if records is not None:
+            records.close()
+    return count
+
+def validate_file(path, limits_dict, parser_func, skip_rows, output_log, field_map, record_format=None):
+    failures = iter_file_validation(path, parser_func, skip_rows, limits_dict, field_map)
+    records = record_writer(output_log, record_format, path)
+    count = write_results(failures, output_log, records)
 
     print("-----------")
-    if not results:
+    if not count:
         print(f"No failed entries were found. Tests are validated!")
     else:
-        os.makedirs(os.path.dirname(output_log), exist_ok=True)
-        with open(output_log, "w", encoding="utf-8") as out:
-            out.write("\n".join(results))
         print(f"Analysis complete. Results saved in: {output_log}")
+        if records is not None:
+            print(f"Structured results saved in: {records.path}")
+    return count
+
+# ---- Batch mode ----
+
+def new_batch_dir(output_folder, prefix):
+    """Create and return a fresh '<prefix>_<timestamp>' folder; a counter is
+    appended when another run took the name within the same second."""
+    base = os.path.join(output_folder, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    path, n = base, 1
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            n += 1
+            path = f"{base}_{n}"
+
+def is_glob(path):
+    # An existing file such as "edac[0].csv" is taken as-is, not as a pattern
+    return not os.path.exists(path) and any(ch in path for ch in "*?[")
+
+def is_batch_path(path):
+    return os.path.isdir(path) or is_glob(path)
+
+def expand_inputs(paths, extension):
+    """Resolve files, folders (every file with the profile's extension) and glob patterns."""
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            matches = [path]
+        elif os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(glob.escape(path), f"*{extension}")))
+        elif is_glob(path):
+            matches = sorted(p for p in glob.glob(path) if os.path.isfile(p))
+        else:
+            matches = [path]
+        for match in matches:
+            if match not in files:
+                files.append(match)
+    return files
+
+def batch_log_names(files):
+    """One '<name>_results.txt' per input, numbered when two inputs share a name."""
+    names = []
+    seen = Counter()
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] += 1
+        names.append(f"{stem}_results.txt" if seen[stem] == 1 else f"{stem}_{seen[stem]}_results.txt")
+    return names
+
+def validate_batch_file(path, limits_dict, parser_name, skip_rows, field_map, output_log, record_format=None):
+    """Validate one file of a batch (runs in a worker process) and tally its failures."""
+    summary = {
+        "path": path, "log": output_log, "rows": 0, "failures": 0,
+        "by_key": Counter(), "by_serial": Counter(), "error": None,
+    }
+
+    def tallied(failures):
+        for failure in failures:
+            summary["by_key"][failure.key] += 1
+            summary["by_serial"][failure.serial] += 1
+            yield failure
+
+    try:
+        failures = iter_file_validation(path, PARSERS[parser_name], skip_rows, limits_dict, field_map, summary)
+        records = record_writer(output_log, record_format, path)
+        summary["failures"] = write_results(tallied(failures), output_log, records)
+        if not summary["failures"]:
+            with open(output_log, "w", encoding="utf-8") as out:
+                out.write("No failed entries were found. Tests are validated!")
+    except (Exception, SystemExit) as e:
+        # Parsers exit on unreadable files; report it against this file only
+        summary["error"] = str(e) or type(e).__name__
+    return summary
+
+def write_batch_summary(summaries, label, summary_path):
+    by_key = Counter()
+    by_serial = Counter()
+    for summary in summaries:
+        by_key.update(summary["by_key"])
+        by_serial.update(summary["by_serial"])
+    failed = sum(1 for s in summaries if s["failures"])
+    errors = sum(1 for s in summaries if s["error"])
+
+    lines = [
+        f"Validation summary: {label}",
+        f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Files: {len(summaries)} | Passed: {len(summaries) - failed - errors} | Failed: {failed} | Errors: {errors}",
+        "",
+        "Per file:",
+    ]
+    for s in summaries:
+        name = os.path.basename(s["path"])
+        if s["error"]:
+            lines.append(f"  ERROR {name}: {s['error']}")
+        elif s["failures"]:
+            lines.append(f"  FAIL  {name}: {s['failures']} failures in {s['rows']} rows -> {os.path.basename(s['log'])}")
+        else:
+            lines.append(f"  PASS  {name}: {s['rows']} rows")
+    if by_key:
+        lines += ["", "Failures per limit key:"]
+        lines += [f"  {count:>6}  {key}" for key, count in by_key.most_common()]
+        lines += ["", "Failures per serial:"]
+        lines += [f"  {count:>6}  {serial}" for serial, count in by_serial.most_common()]
+
+    with open(summary_path, "w", encoding="utf-8") as out:
+        out.write("\n".join(lines) + "\n")
+    return failed, errors
+
+def run_batch(files, selected, limits, skip_rows, workers=None, record_format=None):
+    """Validate many files against one profile in a process pool; returns the exit code."""
+    if not files:
+        print("No input files found.")
+        return 1
+
+    batch_dir = new_batch_dir(output_dir, "validation_batch")
+    logs = [os.path.join(batch_dir, name) for name in batch_log_names(files)]
+    jobs = [(path, limits, selected["parser"], skip_rows, selected.get("fields", {}), log, record_format)
+            for path, log in zip(files, logs)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    print(f"🔍 Validating {len(files)} files with {workers} workers...")
+
+    summaries = {}
+
+    def report(summary):
+        summaries[summary["path"]] = summary
+        name = os.path.basename(summary["path"])
+        if summary["error"]:
+            print(f"❌ {name}: {summary['error']}")
+        elif summary["failures"]:
+            print(f"⚠️  {name}: {summary['failures']} failures")
+        else:
+            print(f"✅ {name}: passed")
+
+    if workers == 1:
+        for job in jobs:
+            report(validate_batch_file(*job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(validate_batch_file, *job) for job in jobs]
+            for future in as_completed(futures):
+                report(future.result())
+
+    summary_path = os.path.join(batch_dir, "summary.txt")
+    failed, errors = write_batch_summary([summaries[path] for path in files], selected["label"], summary_path)
+    print("-----------")
+    print(f"{len(files)} files validated: {len(files) - failed - errors} passed, {failed} failed, {errors} errors.")
+    print(f"Results saved in: {batch_dir}")
+    return 1 if failed or errors else 0
+
+# ---- Watch mode ----
+# A long-running loop over a drop folder: each new file is matched to a
+# profile and validated in this process, so limits, numpy and openpyxl are
+# only loaded once.
+
+class InotifyWatcher:
+    """Reports files closed after writing, or moved into the folder (Linux)."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, folder):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.folder = folder
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def poll(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        paths = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                paths.append(os.path.join(self.folder, os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Reports files whose size and mtime held still between two scans."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.seen = self._scan()
+        self.pending = {}
+
+    def _scan(self):
+        found = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    found[entry.path] = (st.st_size, st.st_mtime_ns)
+        return found
+
+    def poll(self, timeout):
+        time.sleep(timeout)
+        ready = []
+        current = self._scan()
+        for path, stamp in current.items():
+            if self.seen.get(path) == stamp:
+                continue
+            if self.pending.get(path) == stamp:
+                ready.append(path)
+                self.seen[path] = stamp
+                del self.pending[path]
+            else:
+                self.pending[path] = stamp
+        for path in set(self.seen) - set(current):
+            del self.seen[path]
+        return ready
+
+    def close(self):
+        pass
+
+def make_watcher(folder):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify unavailable ({e}), falling back to polling.")
+    return PollingWatcher(folder)
+
+def sniff_score(path, profile, skip_rows):
+    """How well the first data row of path fits profile (0 = not at all)."""
+    try:
+        rows = read_rows(path, PARSERS[profile["parser"]], skip_rows)
+        try:
+            first = next(rows, None)
+        finally:
+            rows.close()
+    except (Exception, SystemExit):
+        return 0
+    if not first:
+        return 0
+    field_map = profile.get("fields", {})
+    if field_map.get("key", "NetworkChartType") in first and field_map.get("value", "Value") in first:
+        return 1
+    limits = load_limits(profile['limits']['json'], profile['limits']['root'])
+    return len(limits.keys() & first.keys())
+
+def pick_profile(path, validators, skip_rows):
+    """Profile key for path: by extension, then by name in the file name, then by sniffing its header."""
+    ext = os.path.splitext(path)[1].lower()
+    candidates = [key for key, profile in validators.items()
+                  if profile_extension(profile) == ext and profile.get("parser") in PARSERS]
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    named = [key for key in candidates if any(part and part in stem for part in key.lower().split("_"))]
+    if len(named) == 1:
+        return named[0]
+
+    scores = {key: sniff_score(path, validators[key], skip_rows) for key in (named or candidates)}
+    best = max(scores, key=scores.get)
+    return best if scores[best] else None
+
+def append_watch_report(report_path, line):
+    if os.path.exists(report_path) and os.path.getsize(report_path) >= WATCH_REPORT_MAX_BYTES:
+        os.replace(report_path, os.path.splitext(report_path)[0] + ".1.txt")
+    with open(report_path, "a", encoding="utf-8") as out:
+        out.write(line + "\n")
+
+def watch_folder(folder, config, profile_key=None, record_format=None, interval=WATCH_INTERVAL):
+    """Validate every file that lands in folder until interrupted."""
+    VALIDATORS = config.get("VALIDATORS", {})
+    SKIP_ROWS = config.get("SKIP_ROWS", 3)
+    if not os.path.isdir(folder):
+        print(f"Folder not found: {folder}")
+        return 1
+    if profile_key is not None:
+        extensions = {profile_extension(VALIDATORS[profile_key])}
+    else:
+        extensions = {profile_extension(p) for p in VALIDATORS.values()}
+
+    watch_dir = os.path.join(output_dir, "watch")
+    os.makedirs(watch_dir, exist_ok=True)
+    report_path = os.path.join(watch_dir, "watch_report.txt")
+    watcher = make_watcher(folder)
+    print(f"👀 Watching {folder} for {', '.join(sorted(extensions))} files ({type(watcher).__name__}). Press Ctrl+C to stop.")
+    print(f"Results: {watch_dir}")
+
+    try:
+        while True:
+            for path in watcher.poll(interval):
+                name = os.path.basename(path)
+                # Skip Office lock files and anything no profile reads
+                if name.startswith("~$") or os.path.splitext(name)[1].lower() not in extensions:
+                    continue
+                if not os.path.isfile(path):
+                    continue
+                stamp = datetime.now()
+                key = profile_key or pick_profile(path, VALIDATORS, SKIP_ROWS)
+                if key is None:
+                    print(f"❔ {name}: no matching validator profile, skipped")
+                    append_watch_report(report_path, f"{stamp:%Y-%m-%d %H:%M:%S} | SKIPPED | {name} | no matching profile")
+                    continue
+
+                profile = VALIDATORS[key]
+                limits = load_limits(profile['limits']['json'], profile['limits']['root'])
+                stem = os.path.splitext(name)[0]
+                log = os.path.join(watch_dir, f"{stamp:%Y%m%d_%H%M%S}_{stem}_results.txt")
+                started = time.perf_counter()
+                summary = validate_batch_file(path, limits, profile["parser"], SKIP_ROWS,
+                                              profile.get("fields", {}), log, record_format)
+                elapsed = time.perf_counter() - started
+
+                if summary["error"]:
+                    status, detail = "ERROR", summary["error"]
+                    print(f"❌ {name} [{profile['label']}]: {detail}")
+                elif summary["failures"]:
+                    status, detail = "FAIL", f"{summary['failures']} failures in {summary['rows']} rows -> {os.path.basename(log)}"
+                    print(f"⚠️  {name} [{profile['label']}]: {summary['failures']} failures ({elapsed:.2f}s)")
+                else:
+                    status, detail = "PASS", f"{summary['rows']} rows"
+                    print(f"✅ {name} [{profile['label']}]: passed ({elapsed:.2f}s)")
+                append_watch_report(report_path, f"{stamp:%Y-%m-%d %H:%M:%S} | {status} | {name} | {key} | {detail}")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
+    return 0
 
 # ---- Main ----
 
-def main():
+def parse_args(argv, validators):
+    parser = argparse.ArgumentParser(description="Validate measurement files against limit profiles.")
+    parser.add_argument("paths", nargs="*", help="Files, folders or glob patterns to validate")
+    parser.add_argument("--profile", choices=list(validators), help="Validator profile from config.json")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--format", choices=RECORD_FORMATS, default=None,
+                        help="Also write structured results (row, serial, key, value, low, high, kind)")
+    parser.add_argument("--watch", metavar="FOLDER",
+                        help="Keep running and validate each new file dropped into FOLDER")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                        help=f"Seconds between folder checks in watch mode (default: {WATCH_INTERVAL})")
+    args = parser.parse_args(argv)
+    if not args.watch and (not args.paths or not args.profile):
+        parser.error("give --profile and at least one path, or --watch FOLDER")
+    return args
+
+def run_cli(argv, config):
+    """Non-interactive batch or watch run; a batch exits nonzero when any file fails."""
+    VALIDATORS = config.get("VALIDATORS", {})
+    args = parse_args(argv, VALIDATORS)
+    prepare_record_format(args.format)
+    if args.watch:
+        return watch_folder(args.watch, config, args.profile, args.format, args.interval)
+    selected = VALIDATORS[args.profile]
+    if selected.get("parser") not in PARSERS:
+        print(f"No parser function found for '{selected.get('parser')}'")
+        return 1
+    limits = load_limits(selected['limits']['json'], selected['limits']['root'])
+    files = expand_inputs(args.paths, profile_extension(selected))
+    return run_batch(files, selected, limits, config.get("SKIP_ROWS", 3), args.workers, args.format)
+
+def main(argv=None):
     config = load_config(config_path)
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_cli(argv, config)
+
     SKIP_ROWS = config.get("SKIP_ROWS", 3)
     VALIDATORS = config.get("VALIDATORS", {})
     OUTPUT_LOG = os.path.join(output_dir, "validation_results.txt")
@@ -197,14 +1049,18 @@ def main():
     keys = list(VALIDATORS.keys())
     for i, key in enumerate(keys, start=1):
         print(f"{i}. {VALIDATORS[key]['label']}")
+    print(f"{len(keys) + 1}. Watch a drop folder (validate new files as they arrive)")
 
-    choice = input(f"Enter 1-{len(keys)}: ").strip()
-    if not choice.isdigit() or not (1 <= int(choice) <= len(keys)):
+    choice = input(f"Enter 1-{len(keys) + 1}: ").strip()
+    if not choice.isdigit() or not (1 <= int(choice) <= len(keys) + 1):
         print("Invalid choice.")
         sys.exit(1)
+    if int(choice) == len(keys) + 1:
+        folder = input("Drop the path to the folder to watch: ").strip().strip('"')
+        return watch_folder(folder, config)
     selected_key = keys[int(choice) - 1]
     selected = VALIDATORS[selected_key]
-    file_path = input(f"Drop the path to the {selected['label']} file: ").strip().strip('"')
+    file_path = input(f"Drop the path to the {selected['label']} file (or a folder / glob for a batch): ").strip().strip('"')
     limits = load_limits(selected['limits']['json'], selected['limits']['root'])
     parser_name = selected.get('parser')
     parser_func = PARSERS.get(parser_name)
@@ -212,12 +1068,23 @@ def main():
         print(f"No parser function found for '{parser_name}'")
         sys.exit(1)
 
+    record_format = input(f"Also save structured results? ({'/'.join(RECORD_FORMATS)}, Enter to skip): ").strip().lower()
+    if record_format and record_format not in RECORD_FORMATS:
+        print(f"Unknown format '{record_format}', skipping structured results.")
+        record_format = None
+    prepare_record_format(record_format)
+
+    if is_batch_path(file_path):
+        files = expand_inputs([file_path], profile_extension(selected))
+        return run_batch(files, selected, limits, SKIP_ROWS, record_format=record_format or None)
+
     field_map = selected.get("fields", {})
-    validate_file(file_path, limits, parser_func, SKIP_ROWS, OUTPUT_LOG, field_map)
+    validate_file(file_path, limits, parser_func, SKIP_ROWS, OUTPUT_LOG, field_map, record_format or None)
+    return 0
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         sys.exit(1)
     except Exception as e: